@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks
+    ~~~~~~~~~~
+
+    Provides a minimal benchmark runner. Benchmarks are registered with the
+    `benchmark` decorator; each one is a setup function that returns the
+    zero argument callable to time (or a generator function that yields it,
+    and cleans up once it has been timed).
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import json
+import platform
+
+from inspect import isgenerator
+
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import mezmorize
+
+BENCHMARKS = OrderedDict()
+MIN_TIME = 0.2
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def calibrate(func, min_time=MIN_TIME):
+    """Returns the number of loops needed to run `func` for at least
+    `min_time` seconds
+    """
+    number = 1
+
+    while True:
+        start = timer()
+
+        for _ in range(number):
+            func()
+
+        if timer() - start >= min_time:
+            return number
+
+        number *= 2
+
+
+def measure(func, repeat=5, min_time=MIN_TIME):
+    """Returns the best time per call (in seconds) of `repeat` runs"""
+    number = calibrate(func, min_time)
+    timings = []
+
+    for _ in range(repeat):
+        start = timer()
+
+        for _ in range(number):
+            func()
+
+        timings.append((timer() - start) / number)
+
+    return min(timings)
+
+
+def measure_memory(func, repeat=5, **kwargs):
+    """Returns the lowest peak memory (in bytes) allocated by a call of
+    `repeat` calls (requires Python 3)
+    """
+    func()
+    peaks = []
+
+    for _ in range(repeat):
+        tracemalloc.start()
+
+        try:
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    return min(peaks)
+
+
+def run(pattern=None, repeat=5, min_time=MIN_TIME, memory=False):
+    """Yields (name, seconds per call) for each matching benchmark, or
+    (name, peak bytes per call) if `memory` is True
+    """
+    measurer = measure_memory if memory else measure
+
+    for name, setup in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+
+        func = setup()
+        cleanup = func if isgenerator(func) else None
+
+        try:
+            func = next(cleanup) if cleanup else func
+            result = func and measurer(func, repeat, min_time=min_time)
+        finally:
+            if cleanup:
+                cleanup.close()
+
+        if func:
+            yield name, result
+
+
+def get_meta():
+    return {
+        'version': mezmorize.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation()}
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'meta': get_meta(), 'results': results}, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['results']
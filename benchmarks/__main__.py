@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks.__main__
+    ~~~~~~~~~~~~~~~~~~~
+
+    Runs the benchmarks
+
+    Examples:
+        python -m benchmarks
+        python -m benchmarks -k memoize_hit --save
+        python -m benchmarks --compare benchmarks/results/0.25.0.json
+        python -m benchmarks -k get_values --memory
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import sys
+
+from os import path as p
+from argparse import ArgumentParser
+
+from . import (  # noqa: F401
+    run, save, load, get_meta, bench_memoize, bench_eviction, bench_threads)
+
+RESULTS_DIR = p.join(p.dirname(__file__), 'results')
+
+
+def get_parser():
+    parser = ArgumentParser(prog='benchmarks', description='Runs benchmarks')
+
+    parser.add_argument(
+        '-k', '--pattern', help='Only run benchmarks whose name contains this')
+
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='Number of timed runs per benchmark (default: 5)')
+
+    parser.add_argument(
+        '-t', '--min-time', type=float, default=0.2,
+        help='Minimum duration (in seconds) of each run (default: 0.2)')
+
+    parser.add_argument(
+        '-m', '--memory', action='store_true',
+        help='Measure the peak memory allocated per call instead of the time')
+
+    parser.add_argument(
+        '-s', '--save', nargs='?', const='',
+        help='Save the results as JSON (default: results/<version>.json)')
+
+    parser.add_argument(
+        '-c', '--compare', help='Compare the results with a saved JSON file')
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    baseline = load(args.compare) if args.compare else {}
+    results = {}
+    kwargs = {
+        'repeat': args.repeat, 'min_time': args.min_time,
+        'memory': args.memory}
+
+    for name, value in run(args.pattern, **kwargs):
+        results[name] = value
+
+        if args.memory:
+            line = '{:<40} {:>12,d} B'.format(name, value)
+        else:
+            line = '{:<40} {:>12.2f} us'.format(name, value * 10 ** 6)
+
+        if name in baseline and value:
+            line += '  {:>6.2f}x'.format(baseline[name] / value)
+
+        print(line)
+        sys.stdout.flush()
+
+    if args.save is not None:
+        filename = '{}.json'.format(get_meta()['version'])
+        path = args.save or p.join(RESULTS_DIR, filename)
+        save(path, results)
+        print('Saved results to {}'.format(path))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks.bench_eviction
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides benchmarks for the eviction policies of the in-process backends
+
+    The workload is a skewed (Pareto distributed) stream of requests for keys
+    whose compute cost and size vary independently. Besides the timed replays
+    registered below, `python -m benchmarks.bench_eviction` reports the hit
+    ratio and the share of the total compute cost each policy saved.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import random
+
+from functools import partial
+
+from mezmorize.backends import get_simple_cls
+
+from . import benchmark
+
+POLICIES = (None, 'lru', 'gdsf')
+NUM_KEYS = 5000
+NUM_REQUESTS = 20000
+THRESHOLD = 500
+SEED = 1
+
+
+def gen_workload(num_keys=NUM_KEYS, num_requests=NUM_REQUESTS, seed=SEED):
+    """Returns the requested keys and the cost (seconds) and value of each key
+    """
+    rand = random.Random(seed)
+    costs = [rand.lognormvariate(-5, 2) for _ in range(num_keys)]
+    values = ['v' * int(rand.paretovariate(1) * 64) for _ in range(num_keys)]
+    keys = [
+        int(rand.paretovariate(0.3)) % num_keys for _ in range(num_requests)]
+
+    return keys, costs, values
+
+
+def replay(cache, workload):
+    """Returns the number of hits and the compute cost they saved"""
+    keys, costs, values = workload
+    cost_aware = getattr(cache, 'cost_aware', False)
+    hits = saved = 0
+
+    for key in keys:
+        name = str(key)
+
+        if cache.get(name) is None:
+            kwargs = {'cost': costs[key]} if cost_aware else {}
+            cache.set(name, values[key], **kwargs)
+        else:
+            hits += 1
+            saved += costs[key]
+
+    return hits, saved
+
+
+def eviction(policy, workload):
+    cache_cls = get_simple_cls(policy)
+    return lambda: replay(cache_cls(THRESHOLD, 0), workload)
+
+
+def main():
+    workload = gen_workload()
+    total = sum(workload[1][key] for key in workload[0])
+
+    for policy in POLICIES:
+        hits, saved = eviction(policy, workload)()
+        print('{:<8} hit ratio {:>6.1%}  cost saved {:>6.1%}'.format(
+            policy or 'simple', hits / NUM_REQUESTS, saved / total))
+
+
+for policy in POLICIES:
+    name = 'eviction.{}'.format(policy or 'simple')
+    benchmark(name)(partial(eviction, policy, gen_workload()))
+
+
+if __name__ == '__main__':
+    main()
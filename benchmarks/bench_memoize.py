@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks.bench_memoize
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides benchmarks for the memoize hot path, key generation, bulk
+    operations and chunked large values
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from itertools import count
+from functools import partial
+from tempfile import mkdtemp
+
+from mezmorize import Cache
+
+from . import benchmark
+
+CACHE_TYPES = {
+    'simple': 'simple',
+    'filesystem': 'filesystem',
+    'memcached': 'benchmarks.standins.memcached',
+    'spreadsaslmemcached': 'benchmarks.standins.spreadsaslmemcached',
+    'redis': 'benchmarks.standins.redis'}
+
+ARG_SIZES = (1, 10, 100, 1000)
+IDENTITIES = ('repr', 'cache_key', 'key_self')
+BULK_SIZE = 100
+LARGE_VALUE_SIZE = 2 ** 22
+
+
+def get_cache(cache_type, **config):
+    config['CACHE_TYPE'] = CACHE_TYPES[cache_type]
+
+    if cache_type == 'filesystem':
+        config['CACHE_DIR'] = mkdtemp()
+
+    return Cache(**config)
+
+
+def get_memoized(cache):
+    @cache.memoize()
+    def add(a, b):
+        return a + b
+
+    return add
+
+
+def memoize_hit(cache_type):
+    func = get_memoized(get_cache(cache_type))
+    func(1, 2)
+    return partial(func, 1, 2)
+
+
+def memoize_hit_scoped(cache_type):
+    """Like `memoize_hit`, but within a request scope"""
+    cache = get_cache(cache_type)
+    func = get_memoized(cache)
+    func(1, 2)
+
+    with cache.request_scope():
+        yield partial(func, 1, 2)
+
+
+def memoize_miss(cache_type):
+    func = get_memoized(get_cache(cache_type))
+    counter = count()
+    return lambda: func(next(counter), 2)
+
+
+def set_many(cache_type):
+    cache = get_cache(cache_type)
+    mapping = {'key{}'.format(i): i for i in range(BULK_SIZE)}
+    return partial(cache.set_many, mapping)
+
+
+def get_many(cache_type):
+    cache = get_cache(cache_type)
+    keys = ['key{}'.format(i) for i in range(BULK_SIZE)]
+    cache.set_many(dict(zip(keys, keys)))
+    return partial(cache.get_many, *keys)
+
+
+class Record(object):
+    """An object with a heavy repr, e.g., an ORM model"""
+    def __init__(self, id, size=100):
+        self.id = id
+        self.fields = {'field{}'.format(i): i for i in range(size)}
+
+    def __repr__(self):
+        return 'Record({!r})'.format(self.fields)
+
+
+class KeyedRecord(Record):
+    def __cache_key__(self):
+        return 'Record:{}'.format(self.id)
+
+
+def method_hit(identity):
+    cache = get_cache('simple')
+    key_self = (lambda record: record.id) if identity == 'key_self' else None
+    base = KeyedRecord if identity == 'cache_key' else Record
+
+    class Model(base):
+        @cache.memoize(key_self=key_self)
+        def total(self, b):
+            return self.id + b
+
+    record = Model(1)
+    record.total(2)
+    return partial(record.total, 2)
+
+
+def get_values(trusted):
+    cache = get_cache('memcached', CACHE_KEY_PREFIX='prefix:')
+    keys = ['key{}'.format(i) for i in range(BULK_SIZE)]
+    cache.set_many(dict(zip(keys, keys)))
+    return partial(cache.get_values, *keys, trusted=trusted)
+
+
+def make_cache_key(size):
+    func = get_memoized(get_cache('simple'))
+    arg = list(range(size))
+    return partial(func.make_cache_key, func.uncached, arg, arg)
+
+
+def make_cache_key_ignore(size):
+    """Like `make_cache_key`, but the second (large) argument is ignored"""
+    cache = get_cache('simple')
+
+    @cache.memoize(ignore=('b',))
+    def add(a, b):
+        return a + b
+
+    arg = list(range(size))
+    return partial(add.make_cache_key, add.uncached, [], arg)
+
+
+def gen_args(size):
+    cache = get_cache('simple')
+    func = get_memoized(cache).uncached
+    arg = list(range(size))
+    return lambda: tuple(cache._gen_args(func, arg, b=arg))
+
+
+def memoize_version(cache_type):
+    cache = get_cache(cache_type)
+    func = get_memoized(cache).uncached
+    return partial(cache._memoize_version, func)
+
+
+def chunked_set_get():
+    cache = get_cache('spreadsaslmemcached')
+    value = 'a' * LARGE_VALUE_SIZE
+
+    def set_get():
+        cache.set('big', value)
+        return cache.get('big')
+
+    return set_get
+
+
+BACKEND_BENCHMARKS = (
+    memoize_hit, memoize_hit_scoped, memoize_miss, memoize_version, set_many,
+    get_many)
+
+for cache_type in CACHE_TYPES:
+    for func in BACKEND_BENCHMARKS:
+        name = '{}.{}'.format(func.__name__, cache_type)
+        benchmark(name)(partial(func, cache_type))
+
+for size in ARG_SIZES:
+    for func in (make_cache_key, make_cache_key_ignore, gen_args):
+        name = '{}.args{}'.format(func.__name__, size)
+        benchmark(name)(partial(func, size))
+
+for identity in IDENTITIES:
+    benchmark('method_hit.{}'.format(identity))(partial(method_hit, identity))
+
+benchmark('get_values.trusted')(partial(get_values, True))
+benchmark('get_values.untrusted')(partial(get_values, False))
+benchmark('chunked_set_get.4MB')(chunked_set_get)
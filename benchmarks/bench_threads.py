@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks.bench_threads
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides benchmarks for the in-process backends under concurrent access.
+    Each run splits a fixed number of memoized calls (all hits) between the
+    given number of threads.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import random
+
+from functools import partial
+from threading import Thread
+
+from mezmorize import Cache
+
+from . import benchmark
+
+CACHE_TYPES = ('simple', 'striped')
+THREADS = (1, 4, 16)
+NUM_CALLS = 4096
+NUM_KEYS = 1000
+
+
+def work(func, keys):
+    for key in keys:
+        func(key)
+
+
+def threaded(cache_type, num_threads):
+    cache = Cache(CACHE_TYPE=cache_type, CACHE_THRESHOLD=NUM_KEYS * 2)
+
+    @cache.memoize()
+    def square(a):
+        return a * a
+
+    rand = random.Random(0)
+    keys = [rand.randrange(NUM_KEYS) for _ in range(NUM_CALLS)]
+    list(map(square, range(NUM_KEYS)))
+    size = NUM_CALLS // num_threads
+
+    def run():
+        threads = [
+            Thread(target=work, args=(square, keys[pos:pos + size]))
+            for pos in range(0, NUM_CALLS, size)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+    return run
+
+
+for cache_type in CACHE_TYPES:
+    for num_threads in THREADS:
+        name = 'threaded.{}.threads{}'.format(cache_type, num_threads)
+        benchmark(name)(partial(threaded, cache_type, num_threads))
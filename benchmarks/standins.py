@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    benchmarks.standins
+    ~~~~~~~~~~~~~~~~~~~
+
+    Provides in-process stand-ins for the memcached and redis clients so the
+    remote backends can be benchmarked without running servers. Values are
+    pickled like the real clients do, but there is no network round trip.
+
+    The factories below can be used as a `CACHE_TYPE`, e.g.,
+    `Cache(CACHE_TYPE='benchmarks.standins.memcached')`.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import pickle
+import fnmatch
+
+from time import time
+
+from werkzeug.contrib.cache import MemcachedCache as _MemcachedCache
+
+from mezmorize import backends
+
+MAX_VALUE_SIZE = 2 ** 20
+
+
+class TooBig(Exception):
+    pass
+
+
+class FakeMemcacheClient(object):
+    TooBig = TooBig
+
+    def __init__(self):
+        self._data = {}
+
+    def _dumps(self, value):
+        if isinstance(value, bytes):
+            return value, False
+
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if len(pickled) > MAX_VALUE_SIZE:
+            raise TooBig()
+
+        return pickled, True
+
+    def _load(self, key):
+        try:
+            expires, value, is_pickled = self._data[key]
+        except KeyError:
+            return None
+
+        if expires and expires <= time():
+            del self._data[key]
+            return None
+
+        return pickle.loads(value) if is_pickled else value
+
+    def get(self, key):
+        return self._load(key)
+
+    def get_multi(self, keys):
+        values = ((key, self._load(key)) for key in keys)
+        return {k: v for k, v in values if v is not None}
+
+    def set(self, key, value, time=0):
+        self._data[key] = (time,) + self._dumps(value)
+        return True
+
+    def set_multi(self, mapping, time=0):
+        for key, value in mapping.items():
+            self.set(key, value, time)
+
+        return []
+
+    def add(self, key, value, time=0):
+        if self._load(key) is None:
+            return self.set(key, value, time)
+
+        return False
+
+    def delete(self, key):
+        return self._data.pop(key, None) is not None
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+
+        return True
+
+    def incr(self, key, delta=1):
+        value = self._load(key)
+
+        if value is not None:
+            self.set(key, value + delta)
+            return value + delta
+
+    def decr(self, key, delta=1):
+        return self.incr(key, -delta)
+
+    def append(self, key, value):
+        return key in self._data
+
+    def flush_all(self):
+        self._data.clear()
+        return True
+
+
+class FakePipeline(object):
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: self.calls.append((method, args, kwargs))
+
+    def execute(self, raise_on_error=True):
+        calls, self.calls = self.calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self._data = {}
+
+    def _encode(self, key):
+        return key.encode('utf-8') if not isinstance(key, bytes) else key
+
+    def _load(self, name):
+        key = self._encode(name)
+
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            return None
+
+        if expires and expires <= time():
+            del self._data[key]
+            return None
+
+        return value
+
+    def get(self, name):
+        return self._load(name)
+
+    def mget(self, keys):
+        return [self._load(key) for key in keys]
+
+    def set(self, name, value):
+        self._data[self._encode(name)] = (0, value)
+        return True
+
+    def setex(self, name, value, time):
+        return self.psetex(name, time * 1000, value)
+
+    def psetex(self, name, time_ms, value):
+        self._data[self._encode(name)] = (time() + time_ms / 1000, value)
+        return True
+
+    def setnx(self, name, value):
+        if self._load(name) is None:
+            return self.set(name, value)
+
+        return False
+
+    def expire(self, name, time):
+        value = self._load(name)
+        return value is not None and self.setex(name, value, time)
+
+    def pttl(self, name):
+        key = self._encode(name)
+        expires = self._data[key][0] if self._load(name) is not None else -2
+        return int((expires - time()) * 1000) if expires > 0 else expires
+
+    def delete(self, *names):
+        return sum(self._data.pop(self._encode(n), None) is not None
+                   for n in names)
+
+    def exists(self, name):
+        return self._load(name) is not None
+
+    def incr(self, name, amount=1):
+        value = int(self._load(name) or 0) + amount
+        key = self._encode(name)
+        expires = self._data[key][0] if key in self._data else 0
+        self._data[key] = (expires, str(value).encode('ascii'))
+        return value
+
+    def decr(self, name, amount=1):
+        return self.incr(name, -amount)
+
+    def keys(self, pattern='*'):
+        return list(self.scan_iter(pattern))
+
+    def scan_iter(self, match='*', count=None):
+        pattern = self._encode(match)
+        return (k for k in list(self._data) if fnmatch.fnmatch(k, pattern))
+
+    def flushdb(self):
+        self._data.clear()
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def memcached(config, *args, **kwargs):
+    key_prefix = config.get('CACHE_KEY_PREFIX')
+    return _MemcachedCache(servers=FakeMemcacheClient(), key_prefix=key_prefix)
+
+
+def spreadsaslmemcached(config, *args, **kwargs):
+    kwargs.setdefault('client', FakeMemcacheClient())
+    return backends.spreadsaslmemcached(config, *args, **kwargs)
+
+
+def redis(config, *args, **kwargs):
+    key_prefix = config.get('CACHE_KEY_PREFIX')
+    return backends.RedisCache(host=FakeRedis(), key_prefix=key_prefix)
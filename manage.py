@@ -116,6 +116,20 @@ def test(source=None, where=None, stop=False, **kwargs):
         exit(e.returncode)
 
 
+@manager.arg('pattern', 'k', help='Benchmarks to run', default=None)
+@manager.arg(
+    'save', 's', help='Save the results', type=bool, default=False)
+@manager.arg('compare', 'c', help='Results file to compare with', default=None)
+@manager.command
+def bench(pattern=None, save=False, compare=None):
+    """Run benchmarks"""
+    args = ['python', '-m', 'benchmarks']
+    args += ['-k', pattern] if pattern else []
+    args += ['--save'] if save else []
+    args += ['--compare', compare] if compare else []
+    exit(call(args))
+
+
 @manager.command
 def register():
     """Register package with PyPI"""
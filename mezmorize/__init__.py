@@ -15,21 +15,46 @@ from __future__ import (
 import base64
 import hashlib
 import inspect
+import os
+import pickle
+import string
 import uuid
 import warnings
 
-from importlib import import_module
+from random import SystemRandom
+from threading import Lock, Thread
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice, repeat
+from multiprocessing import cpu_count
+from weakref import WeakSet
 from functools import partial, wraps
+from timeit import default_timer as timer
 
-from six import PY3
+from six import PY3, integer_types
 from werkzeug.contrib.cache import _test_memcached_key
 
 from . import backends
+from .breaker import BackendUnavailable, CircuitBreaker
+from .coalesce import (
+    Coalescer, asyncio, get_running_loop, is_coroutine_function)
+from .policies import get_timeout
+from .registry import get_registry
+from .scope import ScopeVar
+from .snapshot import write_snapshot, read_header, gen_items
+from .stats import Stats, Laps, Profile, instrument, timed
 from .utils import (
     DEF_THRESHOLD, DEF_DEFAULT_TIMEOUT, ENCODING, decode, get_cache_config,
-    get_cache_type)
+    get_cache_type, gen_call_args, call_uncached, get_executor,
+    import_object, time_call)
 
-__version__ = '0.25.0'
+try:
+    from .aio import wrap_coroutine
+except SyntaxError:
+    # Python < 3.5
+    wrap_coroutine = None
+
+__version__ = '0.26.0'
 __title__ = 'mezmorize'
 __package_name__ = 'mezmorize'
 __author__ = 'Reuben Cummings'
@@ -54,6 +79,62 @@ else:
 
 FIRST_NC = NULL_CONTROL[0]
 
+# Memoized cache keys are a hash of the function name and arguments followed by
+# the version hashes of the function (and instance, and tags).
+KEY_HASH_LEN = 16
+VERSION_HASH_LEN = 6
+
+# The hash lengths when `CACHE_COMPACT_KEYS` is set. Both are multiples of 4
+# so that the base64 encoding doesn't waste any bits.
+COMPACT_KEY_HASH_LEN = 12
+COMPACT_VERSION_HASH_LEN = 4
+
+# Counter versions are encoded with the base64 alphabet so that their tokens
+# look like (and have the same length as) hash versions
+B64_CHARS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+B64_CHARS += '+/'
+VERSIONING_MODES = {'hash', 'counter'}
+
+# Max number of keys per bulk delete when reclaiming orphaned entries
+RECLAIM_BATCH_SIZE = 256
+
+# memcached's max key length (in bytes)
+MC_MAX_KEY_LEN = 250
+
+# Raised by the backends when a cached value can't be unpickled, e.g., an
+# exception whose __init__ takes other arguments than its `args`, or a result
+# whose class was moved
+UNPICKLING_ERRORS = (
+    pickle.UnpicklingError, AttributeError, EOFError, ImportError,
+    IndexError, TypeError)
+
+# Number of items per page, and of pages per `get_many`, of memoized generators
+DEF_PAGE_SIZE = 100
+DEF_PAGE_WINDOW = 8
+
+# The namespaces of functions by (module, name), since computing them is
+# relatively costly and they are needed on every memoized call
+NAMESPACES = {}
+
+# Caches are told when the process forks if possible (Python 3.7+), which is
+# cheaper than comparing process ids on every access
+CACHES = WeakSet()
+CHECK_PID = not hasattr(os, 'register_at_fork')
+
+
+def _after_fork():
+    for cache in list(CACHES):
+        # the lock may have been held by another of the parent's threads
+        cache._cache_lock = Lock()
+        cache._cache_pid = None
+
+        # so that the parent's invalidations (on the bus) aren't ignored
+        cache.uid = uuid.uuid4().hex
+
+
+if not CHECK_PID:
+    os.register_at_fork(after_in_child=_after_fork)
+
 
 def get_namespace(*names):
     text = '.'.join(map(decode, names))
@@ -67,11 +148,41 @@ def get_namespace(*names):
     return namespace
 
 
-def function_namespace(f, *args):
+def get_identity(instance, key_self=None):
+    """
+    Returns the part of a cache key that identifies the instance (or class) of
+    a memoized method. This is `key_self(instance)` if given, else the result
+    of the instance's `__cache_key__` method if it has one, else its repr.
+
+    Example:
+        >>> class User(object):
+        ...     def __init__(self, id):
+        ...         self.id = id
+        ...
+        ...     def __cache_key__(self):
+        ...         return 'User:{}'.format(self.id)
+        >>>
+        >>> get_identity(User(42))
+        'User:42'
+        >>> get_identity(User(42), key_self=lambda user: user.id)
+        42
+    """
+    if key_self:
+        return key_self(instance)
+
+    # like other special methods, it's looked up on the type
+    cache_key = getattr(type(instance), '__cache_key__', None)
+    return cache_key(instance) if cache_key else repr(instance)
+
+
+def function_namespace(f, *args, **kwargs):
     """
-    Attempts to returns unique a namespace for a function
+    Attempts to returns unique a namespace for a function. `key_self` is
+    passed on to `get_identity`, and `plan` (the function's `ArgPlan`) spares
+    inspecting the function again.
     """
-    m_args = getfullargspec(f).args
+    plan = kwargs.get('plan')
+    m_args = plan.args if plan else getfullargspec(f).args
     m_arg = m_args[0] if args and m_args else ''
     arg = args[0] if args else None
     self_instance = getattr(f, '__self__', None)
@@ -93,18 +204,98 @@ def function_namespace(f, *args):
 
         name = '.'.join(n.__name__ for n in (klass, f) if n)
 
-    module = f.__module__
-    ns = get_namespace(module, name)
+    names = (f.__module__, name)
+
+    try:
+        ns = NAMESPACES[names]
+    except KeyError:
+        ns = NAMESPACES[names] = get_namespace(*names)
 
     if not_class or is_self:
         instance = f.__self__ if not_class else arg
-        ins = get_namespace(module, name, repr(instance))
+        identity = get_identity(instance, kwargs.get('key_self'))
+        ins = '{}.{}'.format(ns, get_namespace('{}'.format(identity)))
     else:
         ins = None
 
     return ns, ins
 
 
+class Negative(object):
+    """
+    Wraps a negative result, or an exception raised by a memoized function,
+    so that it can be stored with its own timeout.
+    """
+    def __init__(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+
+    def unwrap(self):
+        if self.exception is not None:
+            raise self.exception
+
+        return self.value
+
+    def round_trips(self):
+        """Returns True if the wrapped exception survives pickling"""
+        try:
+            pickle.loads(pickle.dumps(self.exception))
+        except Exception:
+            return False
+
+        return True
+
+
+class ContentRef(object):
+    """
+    Points to a large memoized result that is stored once under the hash of its
+    pickled content, so that identical results (of different calls) share the
+    same storage. See `CACHE_DEDUPE_SIZE`.
+    """
+    def __init__(self, key):
+        self.key = key
+
+
+class Pages(object):
+    """
+    The header of a memoized generator's result, which is stored in `count`
+    pages of items.
+    """
+    def __init__(self, count=0, size=0):
+        self.count = count
+        self.size = size
+
+
+class ArgPlan(object):
+    """
+    How the arguments of a function are bound into its cache keys. The
+    function's argspec is only inspected once, when the plan is built.
+
+    Args:
+        f (func): The function.
+        ignore (Iter[str]): The names of the arguments to leave out of the
+            cache keys.
+        key_args (dict): A mapping of argument names to the functions used to
+            transform them before they are added to the cache keys.
+    """
+    def __init__(self, f, ignore=None, key_args=None):
+        argspec = getfullargspec(f)
+        _defaults = argspec.defaults or []
+        self.args = argspec.args
+        self.kwonlyargs = getattr(argspec, 'kwonlyargs', None) or []
+        self.defaults = dict(zip(reversed(self.args), reversed(_defaults)))
+        self.defaults.update(getattr(argspec, 'kwonlydefaults', None) or {})
+        self.ignore = frozenset(ignore or ())
+        self.key_args = key_args or {}
+
+        names = set(self.args).union(self.kwonlyargs)
+        unknown = self.ignore.union(self.key_args).difference(names)
+
+        if unknown:
+            msg = '{} has no arguments named {}.'
+            raise ValueError(msg.format(f.__name__, ', '.join(sorted(unknown))))
+
+
 class Cache(object):
     """
     This class is used to control the cache objects.
@@ -119,6 +310,19 @@ class Cache(object):
         config.setdefault('CACHE_ARGS', [])
         config.setdefault('CACHE_TYPE', 'simple')
         config.setdefault('CACHE_NO_NULL_WARNING', False)
+        config.setdefault('CACHE_STATS', False)
+        config.setdefault('CACHE_STATS_LISTENERS', [])
+        config.setdefault('CACHE_PROFILE', False)
+        config.setdefault('CACHE_LOCAL_TIMEOUT', 0)
+        config.setdefault('CACHE_LOCAL_THRESHOLD', DEF_THRESHOLD)
+        config.setdefault('CACHE_BUS', None)
+        config.setdefault('CACHE_KEY_REGISTRY', False)
+        config.setdefault('CACHE_EVICTION', None)
+        config.setdefault('CACHE_COALESCE', False)
+        config.setdefault('CACHE_COMPACT_KEYS', False)
+        config.setdefault('CACHE_VERSIONING', 'hash')
+        config.setdefault('CACHE_DEDUPE_SIZE', None)
+        config.setdefault('CACHE_BREAKER', False)
 
         warning = not config['CACHE_NO_NULL_WARNING']
 
@@ -128,7 +332,36 @@ class Cache(object):
 
         self.namespace = str(namespace or '')
         self.config = config
+
+        if config['CACHE_COMPACT_KEYS']:
+            self.key_hash_len = COMPACT_KEY_HASH_LEN
+            self.version_hash_len = COMPACT_VERSION_HASH_LEN
+        else:
+            self.key_hash_len = KEY_HASH_LEN
+            self.version_hash_len = VERSION_HASH_LEN
+
+        if config['CACHE_VERSIONING'] not in VERSIONING_MODES:
+            msg = 'Unknown versioning mode {}.'
+            raise ValueError(msg.format(config['CACHE_VERSIONING']))
+
+        self.counter_versions = config['CACHE_VERSIONING'] == 'counter'
+        self.random = SystemRandom()
+        self._set_ns_version()
+        listeners = config['CACHE_STATS_LISTENERS']
+
+        if config['CACHE_STATS'] or listeners:
+            self.stats = Stats(listeners=listeners)
+        else:
+            self.stats = None
+
+        self.profiles = {}
+        self.coalescer = Coalescer()
+        self.tasks = {}
+        self.uid = uuid.uuid4().hex
+        self.scope = ScopeVar('mezmorize_scope_' + self.uid)
         self._set_cache()
+        self._set_local()
+        self.reclaimer = None
 
     def _set_cache(self):
         module_string = self.config['CACHE_TYPE']
@@ -141,7 +374,8 @@ class Cache(object):
                 msg = '{} is not a valid Mezmorize backend'
                 raise ImportError(msg.format(module_string))
         else:
-            cache_obj = import_module(module_string)
+            # e.g., 'package.module.factory' or 'package.module:factory'
+            cache_obj = import_object(module_string)
 
         self.cache_type = cache_obj.__name__
         self.is_memcached = 'memcache' in self.cache_type
@@ -154,81 +388,560 @@ class Cache(object):
             kwargs.pop('preferred_memcache', None)
             kwargs.pop('connect_timeout', None)
 
-        self.cache = cache_obj(self.config, *args, **kwargs)
+        # the backend is created on first use (see `cache`)
+        self._cache_factory = partial(cache_obj, self.config, *args, **kwargs)
+        self._cache = self._cache_pid = self._default_registry = None
+        self._cache_lock = Lock()
+        self.breaker = None
+        CACHES.add(self)
 
-        try:
-            self.client_name = self.cache.client_name
-        except AttributeError:
-            self.client_name = None
+    def _connect(self):
+        # Backends with a client (memcached, redis) are recreated so that a
+        # forked child process doesn't share its parent's sockets. The others
+        # (and their contents) are inherited as is.
+        cache = self._cache
+
+        if cache is None or getattr(cache, '_client', None) is not None:
+            cache = self._cache_factory()
+            cache = self._set_breaker(cache)
+
+        if self.is_memcached:
+            # the key prefix is only encoded once
+            prefix = cache._normalize_key('')
+            self._mc_prefix = prefix
+            self._mc_max_len = MC_MAX_KEY_LEN - len(prefix)
+
+        if self.config['CACHE_KEY_REGISTRY'] is True:
+            self._default_registry = get_registry(cache)
+
+        self._cache = cache
+        self._cache_pid = os.getpid()
+
+    def _set_breaker(self, cache):
+        # Only remote backends (those with a client) are guarded
+        options = self.config['CACHE_BREAKER']
+
+        if options and getattr(cache, '_client', None) is not None:
+            options = {} if options is True else options
+            self.breaker = cache = CircuitBreaker(cache, **options)
+
+        return cache
+
+    def _check_cache(self):
+        # Creates the backend on first use, or after a fork
+        if self._cache_pid is None or (
+                CHECK_PID and self._cache_pid != os.getpid()):
+            with self._cache_lock:
+                if self._cache_pid != os.getpid():
+                    self._connect()
+
+    @property
+    def cache(self):
+        """
+        The backend. It is created on first use, and recreated in forked child
+        processes if it holds connections.
+        """
+        self._check_cache()
+        return self._cache
+
+    @property
+    def client_name(self):
+        return getattr(self.cache, 'client_name', None)
+
+    @property
+    def registry(self):
+        registry = self.config['CACHE_KEY_REGISTRY']
+
+        if registry is True:
+            # the default registry is bound to the backend's client
+            self._check_cache()
+            registry = self._default_registry
+
+        return registry or None
+
+    def _set_local(self):
+        local_timeout = self.config['CACHE_LOCAL_TIMEOUT']
+        self.bus = self.config['CACHE_BUS']
+
+        if local_timeout:
+            # the local tier is shared by all of the process' threads
+            threshold = self.config['CACHE_LOCAL_THRESHOLD']
+            self.local = backends.striped(
+                self.config, threshold=threshold, default_timeout=local_timeout)
+        else:
+            self.local = None
+
+        if self.local and self.bus:
+            self.bus.subscribe(self._on_invalidate)
+
+    def _on_invalidate(self, message):
+        if message['origin'] == self.uid:
+            pass
+        elif message['keys'] is None:
+            self.local.clear()
+        else:
+            self.local.delete_many(*message['keys'])
+
+    def _publish(self, *keys):
+        if self.bus:
+            self.bus.publish({'origin': self.uid, 'keys': keys or None})
+
+    def _local_timeout(self, timeout=None):
+        local_timeout = self.config['CACHE_LOCAL_TIMEOUT']
+        return min(timeout, local_timeout) if timeout else local_timeout
+
+    def _encode_mc_keys(self, keys):
+        # Keys generated by mezmorize are base64 or namespaced (see
+        # `get_namespace`), so only their length needs checking
+        prefix, max_len = self._mc_prefix, self._mc_max_len
+
+        if PY3:
+            encoded = [prefix + key for key in keys]
+        else:
+            encoded = [(prefix + key).encode(ENCODING) for key in keys]
+
+        if any(len(key) > max_len for key in keys):
+            encoded = [
+                e if len(k) <= max_len else None
+                for k, e in zip(keys, encoded)]
 
-    def _gen_mapping(self, *args):
-        for key in args:
-            if _test_memcached_key(key):
-                encoded_key = self.cache._normalize_key(key)
-                yield (encoded_key, key)
+        return encoded
 
     # https://github.com/pallets/werkzeug/pull/1161
-    def get_values(self, *args):
-        are_strings = (isinstance(key, str) for key in args)
-        has_encoded_keys = self.cache.key_prefix or not all(are_strings)
-        key_mapping = dict(self._gen_mapping(*args))
-        keys = list(key_mapping)
-        rv = self.cache._client.get_multi(keys)
+    def get_values(self, *args, **kwargs):
+        """
+        Fetches the values of the given keys from memcached in one round trip.
+        Invalid keys are skipped (their value is None), and the keys are only
+        validated if `trusted` is False.
+        """
+        client = self.cache._client
+
+        if kwargs.get('trusted'):
+            encoded = self._encode_mc_keys(args)
+        else:
+            normalize = self.cache._normalize_key
+            encoded = [
+                normalize(key) if _test_memcached_key(key) else None
+                for key in args]
+
+        keys = [k for k in encoded if k]
+
+        if self.breaker:
+            rv = self.breaker.call(client.get_multi, keys)
+        else:
+            rv = client.get_multi(keys)
+
+        return [rv.get(key) for key in encoded]
+
+    @contextmanager
+    def request_scope(self):
+        """
+        A context manager that keeps the values fetched from (or written to)
+        the cache until it exits, so calling a memoized function repeatedly
+        within a single request only hits the backend once. It yields the
+        scope's dict. Nested scopes share the outermost one.
+
+        Each thread and asyncio task sees its own scope, and tasks share the
+        scope they were created in.
+
+        Note: The cached values are returned as is (not copies), and
+        invalidations published by other processes don't reach open scopes.
+        """
+        if self.scope.get() is None:
+            token = self.scope.enter()
+
+            try:
+                yield self.scope.get()
+            finally:
+                self.scope.exit(token)
+        else:
+            yield self.scope.get()
+
+    def _scope_update(self, mapping):
+        scope = self.scope.get()
+
+        if scope is not None:
+            scope.update(mapping)
+
+    def _scope_delete(self, *keys):
+        # Deletes all of the scope's values if no keys are given
+        scope = self.scope.get()
+
+        if scope and keys:
+            for key in keys:
+                scope.pop(key, None)
+        elif scope:
+            scope.clear()
+
+    # The methods below go through the request scope and the local tier (if
+    # enabled). Only the public ones publish invalidations.
+    def _get(self, key):
+        scope = self.scope.get()
+        value = scope.get(key) if scope else None
+
+        if value is None:
+            value = self._fetch(key)
+
+            if scope is not None and value is not None:
+                scope[key] = value
+
+        return value
+
+    def _fetch(self, key):
+        local = self.local
+        value = local.get(key) if local else None
+
+        if value is None:
+            value = self.cache.get(key)
+
+            if local and value is not None:
+                local.set(key, value)
+
+        return value
+
+    def _get_many(self, *keys, **kwargs):
+        scope = self.scope.get()
+
+        if scope is None:
+            return self._fetch_many(*keys, **kwargs)
+
+        values = [scope.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+
+        if missing:
+            fetched = self._fetch_many(*missing, **kwargs)
+            mapping = {k: v for k, v in zip(missing, fetched) if v is not None}
+            scope.update(mapping)
+            values = [
+                mapping.get(key) if value is None else value
+                for key, value in zip(keys, values)]
+
+        return values
+
+    def _fetch_many(self, *keys, **kwargs):
+        # `trusted` skips validating the keys generated by mezmorize, and
+        # `strict` raises BackendUnavailable instead of returning misses
+        local = self.local
+        values = local.get_many(*keys) if local else [None] * len(keys)
+        missing = [key for key, value in zip(keys, values) if value is None]
+
+        if not missing:
+            return values
+
+        try:
+            if self.is_memcached:
+                fetched = self.get_values(*missing, **kwargs)
+            else:
+                fetched = self.cache.get_many(*missing)
+        except BackendUnavailable:
+            if kwargs.get('strict'):
+                raise
+
+            fetched = [None] * len(missing)
+
+        mapping = {k: v for k, v in zip(missing, fetched) if v is not None}
+
+        if local and mapping:
+            local.set_many(mapping)
+
+        return [mapping.get(key) if value is None else value
+                for key, value in zip(keys, values)]
 
-        if has_encoded_keys:
-            rv = {key_mapping[key]: value for key, value in rv.items()}
+    def _set(self, key, value, timeout=None, cost=None):
+        # `cost` is the compute time of a memoized result. It is only passed
+        # on to cost aware backends (see `CACHE_EVICTION`).
+        self._scope_update({key: value})
 
-        return [rv.get(key) for key in args]
+        if self.local:
+            local_timeout = self._local_timeout(timeout)
+            self._cost_set(self.local, key, value, local_timeout, cost)
 
-    def get(self, *args, **kwargs):
+        return self._cost_set(self.cache, key, value, timeout, cost)
+
+    def _cost_set(self, cache, key, value, timeout=None, cost=None):
+        if cost is not None and getattr(cache, 'cost_aware', False):
+            return cache.set(key, value, timeout, cost=cost)
+        else:
+            return cache.set(key, value, timeout)
+
+    def _set_many(self, mapping, timeout=None):
+        self._scope_update(mapping)
+
+        if self.local:
+            self.local.set_many(mapping, self._local_timeout(timeout))
+
+        return self.cache.set_many(mapping, timeout)
+
+    def _delete_many(self, *keys):
+        self._scope_delete(*keys)
+
+        if self.local:
+            self.local.delete_many(*keys)
+
+        return self.cache.delete_many(*keys)
+
+    @timed('get')
+    def get(self, key):
         "Proxy function for internal cache object."
-        return self.cache.get(*args, **kwargs)
+        return self._get(key)
 
-    def set(self, *args, **kwargs):
+    @timed('set')
+    def set(self, key, value, timeout=None):
         "Proxy function for internal cache object."
-        self.cache.set(*args, **kwargs)
+        self._set(key, value, timeout)
+        self._publish(key)
 
-    def add(self, *args, **kwargs):
+    @timed('add')
+    def add(self, key, value, timeout=None):
         "Proxy function for internal cache object."
-        self.cache.add(*args, **kwargs)
+        self._scope_delete(key)
+
+        if self.local:
+            self.local.delete(key)
+
+        added = self.cache.add(key, value, timeout)
+        self._publish(key)
+        return added
 
-    def delete(self, *args, **kwargs):
+    @timed('inc')
+    def inc(self, key, delta=1, timeout=None):
+        """Proxy function for internal cache object. `timeout` applies to the
+        copies of the new value made by replicated backends."""
+        self._scope_delete(key)
+
+        if self.local:
+            self.local.delete(key)
+
+        if getattr(self.cache, 'copies_counters', False):
+            value = self.cache.inc(key, delta, timeout)
+        else:
+            value = self.cache.inc(key, delta)
+
+        self._publish(key)
+        return value
+
+    @timed('delete')
+    def delete(self, key):
         "Proxy function for internal cache object."
-        self.cache.delete(*args, **kwargs)
+        self._delete_many(key)
+        self._publish(key)
 
-    def delete_many(self, *args, **kwargs):
+    @timed('delete_many')
+    def delete_many(self, *keys):
         "Proxy function for internal cache object."
-        self.cache.delete_many(*args, **kwargs)
+        self._delete_many(*keys)
+        self._publish(*keys)
 
+    @timed('clear')
     def clear(self):
         "Proxy function for internal cache object."
+        self._scope_delete()
+
+        if self.local:
+            self.local.clear()
+
         self.cache.clear()
+        self._publish()
 
-    def get_many(self, *args, **kwargs):
+    @timed('get_many')
+    def get_many(self, *keys):
         "Proxy function for internal cache object."
-        if self.is_memcached:
-            values = self.get_values(*args)
-        else:
-            values = self.cache.get_many(*args, **kwargs)
-
-        return values
+        return self._get_many(*keys)
 
-    def set_many(self, *args, **kwargs):
+    @timed('set_many')
+    def set_many(self, mapping, timeout=None):
         "Proxy function for internal cache object."
-        self.cache.set_many(*args, **kwargs)
+        self._set_many(mapping, timeout)
+        self._publish(*mapping)
+
+    def _check_snapshots(self):
+        if not hasattr(self.cache, 'iter_items'):
+            msg = '{} caches do not support snapshots.'
+            raise NotImplementedError(msg.format(self.cache_type))
+
+    def dump(self, fp, compress=True):
+        """
+        Streams the contents of the cache to a binary file object. Supported by
+        the `simple`, `filesystem` and `redis` backends.
+
+        :param fp: A file object opened in binary write mode.
+        :param compress: Compress the record stream with zlib.
+
+        :returns: The number of items written.
+        """
+        self._check_snapshots()
+        items = self.cache.iter_items()
+        kwargs = {'compress': compress, 'hashed_keys': self.cache.hashed_keys}
+        return write_snapshot(fp, items, **kwargs)
+
+    def load(self, fp):
+        """
+        Restores a snapshot created with :meth:`dump` from a binary file
+        object. Items that have expired since the snapshot was taken are
+        skipped.
+
+        Example::
+            >>> from io import BytesIO
+            >>>
+            >>> cache = Cache()
+            >>> cache.set('key', 'value')
+            >>> fp = BytesIO()
+            >>> cache.dump(fp)
+            1
+            >>> new_cache = Cache()
+            >>> new_cache.load(BytesIO(fp.getvalue()))
+            1
+            >>> new_cache.get('key') == 'value'
+            True
+
+        :param fp: A file object opened in binary read mode.
+
+        :returns: The number of items restored.
+        """
+        self._check_snapshots()
+        reader, hashed_keys = read_header(fp)
+
+        if hashed_keys and not self.cache.hashed_keys:
+            raise ValueError(
+                'Snapshots with hashed keys can only be loaded into a '
+                'filesystem cache.')
+
+        self._scope_delete()
+        return self.cache.set_items(gen_items(reader))
 
     def _memvname(self, funcname):
         return funcname + '_memver'
 
-    def _memoize_make_version_hash(self):
+    def _tagvname(self, tag):
+        return self._memvname(get_namespace('tag', '{}'.format(tag)))
+
+    def _encode_hash(self, digest, length):
+        return base64.b64encode(digest)[:length].decode(ENCODING)
+
+    def _set_ns_version(self):
+        # The initial version hash of a namespaced cache is deterministic so
+        # that separate processes agree on it. It only depends on the
+        # namespace, so it is computed once. Counters always start at a
+        # random seed (see `_make_version_seed`).
         if self.namespace.startswith('http'):
             UUID = uuid.uuid3(uuid.NAMESPACE_URL, self.namespace)
-        if self.namespace:
+        elif self.namespace:
             UUID = uuid.uuid3(uuid.NAMESPACE_DNS, self.namespace)
         else:
-            UUID = uuid.uuid4()
+            UUID = None
 
-        return base64.b64encode(UUID.bytes)[:6].decode(ENCODING)
+        if UUID and not self.counter_versions:
+            self.ns_version = self._encode_hash(
+                UUID.bytes, self.version_hash_len)
+        else:
+            self.ns_version = None
+
+    def _version_token(self, version):
+        # Returns the text of a stored version (a hash or a counter)
+        if not isinstance(version, integer_types):
+            return version and decode(version)
+
+        chars = []
+
+        for _ in range(self.version_hash_len):
+            version, pos = divmod(version, len(B64_CHARS))
+            chars.append(B64_CHARS[pos])
+
+        return ''.join(chars)
+
+    def _make_version_seed(self):
+        # Counters start at a random value, even in a namespace, so that a
+        # version key recreated after expiring doesn't revive the entries of
+        # a previous one, and counters of different keys don't step through
+        # the same versions. Processes still agree on the initial version
+        # since it is created with `add`.
+        return self.random.getrandbits(6 * self.version_hash_len)
+
+    def _create_versions(self, keys, timeout=None):
+        # Returns a mapping of the given (missing) version keys to their new
+        # versions. Counters are created with `add`, so concurrent callers
+        # (in any process) end up with the same version.
+        if not keys:
+            versions = {}
+        elif self.counter_versions:
+            versions = {key: self._add_version(key, timeout) for key in keys}
+        else:
+            versions = {key: self._memoize_make_version_hash() for key in keys}
+
+            try:
+                self.set_many(versions, timeout)
+            except BackendUnavailable:
+                # the versions are only used for this call
+                pass
+
+        return versions
+
+    def _add_version(self, key, timeout=None):
+        seed = self._make_version_seed()
+
+        if self.cache.add(key, seed, timeout):
+            version = seed
+        else:
+            # another caller created it first
+            version = self.cache.get(key)
+
+        return seed if version is None else version
+
+    def _reset_version(self, key, version, timeout=None):
+        # Counters are reset with a single (atomic) `inc`
+        if self.counter_versions and isinstance(version, integer_types):
+            new_version = self.inc(key, timeout=timeout)
+        else:
+            new_version = None
+
+        if new_version is None and self.counter_versions:
+            new_version = self._make_version_seed()
+            self.set_many({key: new_version}, timeout)
+        elif new_version is None:
+            new_version = self._memoize_make_version_hash(True)
+            self.set_many({key: new_version}, timeout)
+
+        return new_version
+
+    def _memoize_make_version_hash(self, fresh=False):
+        if self.ns_version and not fresh:
+            version_hash = self.ns_version
+        else:
+            digest = uuid.uuid4().bytes
+            version_hash = self._encode_hash(digest, self.version_hash_len)
+
+        return version_hash
+
+    def _key_generations(self, cache_key):
+        # the version hashes may be followed by a '.' and a page number
+        hash_len = self.version_hash_len
+        versions = cache_key[self.key_hash_len:].partition('.')[0]
+        positions = range(0, len(versions), hash_len)
+        return [versions[pos:pos + hash_len] for pos in positions]
+
+    def _reclaim_keys(self, generations):
+        for generation in generations:
+            keys = list(self.registry.pop(generation))
+
+            for pos in range(0, len(keys), RECLAIM_BATCH_SIZE):
+                try:
+                    self._delete_many(*keys[pos:pos + RECLAIM_BATCH_SIZE])
+                except BackendUnavailable:
+                    # the orphaned entries are left to time out
+                    return
+
+    def _reclaim(self, *generations):
+        # Deletes the entries of swapped out version hashes in the background.
+        # Deterministic (namespaced) hashes are skipped since they are reused
+        # by the next version.
+        current = self.ns_version
+        generations = [g for g in generations if g and g != current]
+
+        if self.registry and generations:
+            self.reclaimer = Thread(
+                target=self._reclaim_keys, args=(generations,))
+            self.reclaimer.daemon = True
+            self.reclaimer.start()
 
     def _memoize_version(self, f, *args, **kwargs):
         """
@@ -236,91 +949,206 @@ class Cache(object):
         """
         reset = kwargs.pop('reset', None)
         delete = kwargs.pop('delete', None)
-        fname, instance_fname = function_namespace(f, *args)
+        tags = kwargs.pop('tags', None) or []
+        key_self = kwargs.pop('key_self', None)
+        plan = kwargs.pop('plan', None)
+        fname, instance_fname = function_namespace(
+            f, *args, key_self=key_self, plan=plan)
         version_key = self._memvname(fname)
 
         if instance_fname:
-            fetch_keys = [version_key, self._memvname(instance_fname)]
+            version_keys = [version_key, self._memvname(instance_fname)]
         else:
-            fetch_keys = [version_key]
+            version_keys = [version_key]
 
         # Only delete the per-instance version key or per-function version
         # key but not both.
         if delete:
-            self.cache.delete_many(fetch_keys[-1])
+            if self.registry:
+                self._reclaim(self._version_token(self.get(version_keys[-1])))
+
+            self.delete_many(version_keys[-1])
             return fname, None
 
-        version_data_list = list(self.get_many(*fetch_keys))
-        dirty = False
+        # The tag versions are fetched in the same round trip
+        fetch_keys = version_keys + [self._tagvname(tag) for tag in tags]
+        get_many = instrument(self.stats, 'get_many', self._get_many)
+
+        try:
+            fetched = get_many(*fetch_keys, trusted=True, strict=True)
+        except BackendUnavailable:
+            if reset:
+                raise
 
-        if version_data_list[0] is None:
-            version_data_list[0] = self._memoize_make_version_hash()
-            dirty = True
+            # Missing versions would be recreated (invalidating the stored
+            # results), so the call gets a throwaway version instead
+            throwaway = map(self._memoize_make_version_hash, repeat(True))
+            return fname, ''.join(islice(throwaway, len(fetch_keys)))
 
-        if instance_fname and version_data_list[1] is None:
-            version_data_list[1] = self._memoize_make_version_hash()
-            dirty = True
+        if self.stats:
+            self.stats.incr('version_fetches')
 
         # Only reset the per-instance version or the per-function version
-        # but not both.
+        # but not both. A reset always needs a new hash, even if namespaced.
         if reset:
-            fetch_keys = fetch_keys[-1:]
-            version_data_list = [self._memoize_make_version_hash()]
-            dirty = True
+            version = fetched[len(version_keys) - 1]
+            self._reclaim(self._version_token(version))
+            reset_version = self._reset_version(
+                version_keys[-1], version, **kwargs)
 
-        if dirty:
-            zipped = zip(fetch_keys, version_data_list)
-            self.cache.set_many(dict(zipped), **kwargs)
+            version_data_list = [reset_version]
+        else:
+            missing = [k for k, v in zip(fetch_keys, fetched) if v is None]
+            created = self._create_versions(missing, **kwargs)
+            version_data_list = [
+                created.get(k, v) for k, v in zip(fetch_keys, fetched)]
+
+        return fname, ''.join(map(self._version_token, version_data_list))
 
-        return fname, ''.join(map(decode, version_data_list))
+    def invalidate_tags(self, *tags):
+        """
+        Invalidates the cached results of all functions memoized with any of
+        the given tags (see :meth:`memoize`). This only swaps out the version
+        hash of each tag, so it costs one write per tag.
+
+        Example::
+            >>> import random
+            >>>
+            >>> cache = Cache()
+            >>>
+            >>> @cache.memoize(tags=lambda user_id: ['user.%s' % user_id])
+            ... def get_profile(user_id):
+            ...     return random.random()
+
+        .. code-block:: python
+
+            >>> profile = get_profile(42)
+            >>> profile == get_profile(42)
+            True
+            >>> cache.invalidate_tags('user.42')
+            >>> profile == get_profile(42)
+            False
+        """
+        keys = [self._tagvname(tag) for tag in tags]
+
+        if keys and (self.registry or self.counter_versions):
+            versions = self.get_many(*keys)
+        else:
+            versions = [None] * len(keys)
+
+        if self.registry:
+            self._reclaim(*map(self._version_token, versions))
+
+        if self.counter_versions:
+            for key, version in zip(keys, versions):
+                self._reset_version(key, version)
+        elif keys:
+            make_version = partial(self._memoize_make_version_hash, True)
+            self.set_many({key: make_version() for key in keys})
 
     def _memoize_make_cache_key(self, make_name=None, decorated=None):
         """
         Function used to create the cache_key for memoized functions.
         """
         def make_cache_key(f, *args, **kwargs):
-            mkwargs = {'timeout': decorated.cache_timeout} if decorated else {}
-            fname, version_data = self._memoize_version(f, *args, **mkwargs)
+            return self._memoize_cache_key(
+                make_name, decorated, f, args, kwargs)
 
-            # this should have to be after version_data, so that it
-            # does not break the delete_memoized functionality.
-            altfname = make_name(fname) if callable(make_name) else fname
+        make_cache_key.profiled = partial(
+            self._memoize_cache_key, make_name, decorated)
 
-            if callable(f):
-                keyargs = tuple(self._gen_args(f, *args, **kwargs))
-                keykwargs = {}
-            else:
-                keyargs, keykwargs = args, kwargs
+        return make_cache_key
 
-            updated = '{0}{1}{2}'.format(altfname, keyargs, keykwargs)
-            cache_key = hashlib.md5()
-            cache_key.update(updated.encode(ENCODING))
-            cache_key = base64.b64encode(cache_key.digest())[:16]
-            cache_key = cache_key.decode(ENCODING)
-            cache_key += version_data
+    def _memoize_cache_key(self, make_name, decorated, f, args, kwargs,
+                           lap=None):
+        # `lap` is called at the end of each phase when profiling
+        mkwargs = {}
 
-            return cache_key
-        return make_cache_key
+        # Version hashes use the default timeout if the timeout is a policy
+        if decorated and not callable(decorated.cache_timeout):
+            mkwargs['timeout'] = decorated.cache_timeout
+
+        if decorated and decorated.tags:
+            tags = decorated.tags(*args, **kwargs)
+            mkwargs['tags'] = sorted(set(map('{}'.format, tags)))
+
+        key_self = decorated.key_self if decorated else None
+        mkwargs['key_self'] = key_self
+        plan = self._get_arg_plan(f, decorated) if callable(f) else None
+        mkwargs['plan'] = plan
+
+        fname, version_data = self._memoize_version(f, *args, **mkwargs)
+
+        if lap:
+            lap('version')
+
+        # this should have to be after version_data, so that it
+        # does not break the delete_memoized functionality.
+        altfname = make_name(fname) if callable(make_name) else fname
+
+        if plan:
+            keyargs = tuple(self._bind_args(f, args, kwargs, key_self, plan))
+            keykwargs = {}
+        else:
+            keyargs, keykwargs = args, kwargs
+
+        if lap:
+            lap('bind')
+
+        updated = '{0}{1}{2}'.format(altfname, keyargs, keykwargs)
+        digest = hashlib.md5(updated.encode(ENCODING)).digest()
+        cache_key = self._encode_hash(digest, self.key_hash_len)
+        cache_key += version_data
+
+        if lap:
+            lap('hash')
+
+        return cache_key
 
     def _gen_args(self, f, *args, **kwargs):
+        return self._bind_args(f, args, kwargs)
+
+    def _get_arg_plan(self, f, decorated=None):
+        # The plan of a memoized function is kept, so it is only built once
+        if decorated and f is decorated.uncached:
+            plan = decorated.arg_plan
+
+            if not plan:
+                plan = decorated.arg_plan = ArgPlan(f)
+        else:
+            plan = ArgPlan(f)
+
+        return plan
+
+    def _bind_args(self, f, args, kwargs, key_self=None, plan=None):
+        plan = plan or ArgPlan(f)
+
+        for m_arg, new_arg in self._bound_args(args, kwargs, key_self, plan):
+            if m_arg in plan.ignore:
+                continue
+            elif m_arg in plan.key_args:
+                new_arg = plan.key_args[m_arg](new_arg)
+
+            yield new_arg
+
+    def _bound_args(self, args, kwargs, key_self, plan):
         # Inspect the arguments to the function
         # This allows the memoization to be the same
         # whether the function was called with
         # 1, b=2 is equivalent to a=1, b=2, etc.
         num_args = len(args)
-        argspec = getfullargspec(f)
-        _defaults = argspec.defaults or []
-        m_args = argspec.args
-        defaults = dict(zip(reversed(m_args), reversed(_defaults)))
+        defaults = plan.defaults
         counter = 0
 
-        for i, m_arg in enumerate(m_args):
+        for i, m_arg in enumerate(plan.args):
             # Subtract from i, m_args that aren't in args
             arg_num = i - counter
 
             if not i and m_arg in ('self', 'cls'):
-                # supports instance methods for the memoized functions
-                new_arg = repr(args[0])
+                # supports instance methods (and classmethods) for the
+                # memoized functions. `key_self` only applies to instances.
+                hook = key_self if m_arg == 'self' else None
+                new_arg = get_identity(args[0], hook)
             elif kwargs.get(m_arg) is not None:
                 new_arg = kwargs[m_arg]
                 counter += 1
@@ -331,9 +1159,19 @@ class Cache(object):
             else:
                 new_arg = None
 
-            yield new_arg
+            yield m_arg, new_arg
 
-    def memoize(self, timeout=None, make_name=None, unless=None):
+        # keyword-only arguments follow the positional ones
+        for m_arg in plan.kwonlyargs:
+            if kwargs.get(m_arg) is not None:
+                yield m_arg, kwargs[m_arg]
+            else:
+                yield m_arg, defaults.get(m_arg)
+
+    def memoize(self, timeout=None, make_name=None, unless=None, profile=None,
+                tags=None, cache_exceptions=None, is_negative=None,
+                negative_timeout=None, coalesce=None, key_self=None,
+                ignore=None, key_args=None):
         """
         Use this to cache the result of a function, taking its arguments into
         account in the cache key.
@@ -379,7 +1217,10 @@ class Cache(object):
 
 
         :param timeout: Default None. If set to an integer, will cache for that
-                        amount of time. Unit of time is in seconds.
+                        amount of time. Unit of time is in seconds. If set to a
+                        function, it is called with each result and the number
+                        of seconds it took to compute, and returns the timeout
+                        (see :class:`~mezmorize.policies.AdaptiveTimeout`).
         :param make_name: Default None. If set this is a function that accepts
                           a single argument, the function name, and returns a
                           new string to be used as the function name. If not
@@ -387,45 +1228,594 @@ class Cache(object):
         :param unless: Default None. Cache will *always* execute the caching
                        facilities unless this callable is true.
                        This will bypass the caching entirely.
+        :param profile: Default None. If True, records the time spent in each
+                        phase of every call (version lookup, argument binding,
+                        hashing, backend get, the function itself and backend
+                        set). The aggregated :class:`~mezmorize.stats.Profile`
+                        is available as the decorated function's ``profile``
+                        attribute and through :meth:`profile_report`. If not
+                        set then ``CACHE_PROFILE`` is used.
+        :param tags: Default None. If set this is a function that accepts the
+                     same arguments as the memoized function and returns an
+                     iterable of tags (e.g., ``['user.42']``). Calling
+                     :meth:`invalidate_tags` with any of these tags
+                     invalidates the result.
+        :param cache_exceptions: Default None. If set to an exception class (or
+                                 a tuple of them), the exceptions of those
+                                 types raised by the function are cached and
+                                 re-raised on later calls with the same
+                                 arguments.
+        :param is_negative: Default None. If set this is a function that
+                            accepts a result and returns True if it is a
+                            negative result (e.g., ``None`` or an empty
+                            response). Negative results are cached with
+                            ``negative_timeout``. Otherwise ``None`` results
+                            are never cached.
+        :param negative_timeout: Default None. The timeout used for cached
+                                 exceptions and negative results. If not set
+                                 then ``timeout`` is used.
+        :param coalesce: Default None. If True, concurrent calls with the same
+                         arguments (from other threads, or other tasks if the
+                         function is a coroutine function) wait for the result
+                         of the first call instead of computing it again. If
+                         not set then ``CACHE_COALESCE`` is used.
+        :param key_self: Default None. If set this is a function that accepts
+                         the instance a memoized method is called on and
+                         returns a cheap, stable identity for it to use in
+                         cache keys (e.g., ``lambda user: user.id``). If not
+                         set then the instance's ``__cache_key__`` method is
+                         used, or its ``repr`` if it has none. It isn't
+                         applied to the class of classmethods.
+        :param ignore: Default None. If set this is an iterable of the names
+                       of arguments to leave out of the cache key (e.g.,
+                       database connections or loggers).
+        :param key_args: Default None. If set this is a dict mapping argument
+                         names to functions that return what to use in the
+                         cache key in place of the argument (e.g., a
+                         fingerprint of a large object).
 
         .. versionadded:: 0.5
             params ``make_name``, ``unless``
-        """
 
-        def _memoize(f):
-            @wraps(f)
-            def decorated(*args, **kwargs):
-                if callable(unless) and unless():  # bypass cache
-                    return f(*args, **kwargs)
+        .. versionadded:: 0.26.0
+            The decorated function's ``cache_stats`` attribute returns its
+            hit, miss, set and error counts, compute time and backend latency
+            histograms (or None unless ``CACHE_STATS`` is enabled).
+
+            params ``profile``, ``tags``, ``cache_exceptions``,
+            ``is_negative``, ``negative_timeout``
 
-                cache_key = decorated.make_cache_key(f, *args, **kwargs)
-                value = self.cache.get(cache_key)
+            ``timeout`` may be a function of the result and compute time
 
-                if value is None:
-                    value = f(*args, **kwargs)
-                    ckwargs = {'timeout': decorated.cache_timeout}
+            params ``key_self``, ``ignore``, ``key_args``, and the
+            ``__cache_key__`` protocol
 
-                    # value is first for addCallback compatibility
-                    def set_cache(value, key):
-                        self.cache.set(key, value, **ckwargs)
-                        return value
+            Coroutine functions are supported. The decorated function is a
+            coroutine function too. param ``coalesce``
 
-                    try:
-                        value.addCallback(set_cache, cache_key)
-                    except AttributeError:
-                        set_cache(value, cache_key)
+            Generator functions are supported. Their items are streamed to
+            the caller and stored in pages of ``page_size`` items, which are
+            fetched ``page_window`` pages at a time on later calls. Both are
+            readable and writable attributes of the decorated function.
+        """
 
-                return value
+        def _memoize(f):
+            if is_coroutine_function(f):
+                decorated = wrap_coroutine(f, self._memoize_async, unless)
+            else:
+                decorated = self._wrap_function(f, unless)
 
             decorated.uncached = f
+            decorated.cache = self
             decorated.cache_timeout = timeout
+            decorated.tags = tags
+            decorated.cache_exceptions = cache_exceptions or ()
+            decorated.is_negative = is_negative
+            decorated.negative_timeout = negative_timeout
+            decorated.page_size = DEF_PAGE_SIZE
+            decorated.page_window = DEF_PAGE_WINDOW
+            decorated.key_self = key_self
+
+            # The plan is built on the first call unless it needs validating
+            decorated.arg_plan = (
+                ArgPlan(f, ignore, key_args) if ignore or key_args else None)
+
+            if coalesce is None:
+                decorated.coalesce = self.config['CACHE_COALESCE']
+            else:
+                decorated.coalesce = coalesce
+
+            self._memoize_instrument(decorated, f, profile)
             m_make_cache_key = self._memoize_make_cache_key
             decorated.make_cache_key = m_make_cache_key(make_name, decorated)
-            decorated.delete_memoized = partial(self.delete_memoized, f)
+            decorated.delete_memoized = partial(
+                self.delete_memoized, decorated)
             return decorated
 
         return _memoize
 
+    def _wrap_function(self, f, unless=None):
+        if inspect.isgeneratorfunction(f):
+            memoizer = self._memoize_generator
+        else:
+            memoizer = None
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if callable(unless) and unless():  # bypass cache
+                return f(*args, **kwargs)
+            elif memoizer:  # generator function
+                return memoizer(decorated, f, args, kwargs)
+            else:
+                return self._memoize_call(decorated, f, args, kwargs)
+
+        return decorated
+
+    def _memoize_instrument(self, decorated, f, profile=None):
+        fname = function_namespace(f)[0]
+        stats = self.stats.child(fname) if self.stats else None
+
+        if profile is None:
+            profile = self.config['CACHE_PROFILE']
+
+        if profile:
+            profile = self.profiles.setdefault(fname, Profile(fname))
+
+        decorated.stats = stats
+        decorated.cache_stats = lambda: stats.as_dict() if stats else None
+        decorated.profile = profile or None
+
+    def _memoize_call(self, decorated, f, args, kwargs):
+        # `laps` times each phase of the call if the function is profiled
+        laps = Laps() if decorated.profile else None
+        stats = decorated.stats
+        cache_key = self._memoize_key(decorated, f, args, kwargs, laps)
+        value = instrument(stats, 'get', self._memoize_get)(cache_key)
+        hit = value is not None
+
+        if laps:
+            laps('get')
+
+        if stats:
+            stats.incr('hits' if hit else 'misses')
+
+        try:
+            if not hit:
+                compute = instrument(stats, 'compute', f)
+                value = self._memoize_miss(
+                    decorated, compute, cache_key, args, kwargs, laps)
+            elif isinstance(value, Negative):
+                value = value.unwrap()
+        finally:
+            if laps:
+                self._memoize_profile(decorated, laps, hit)
+
+        return value
+
+    def _memoize_key(self, decorated, f, args, kwargs, laps=None):
+        make_cache_key = decorated.make_cache_key
+        profiled = getattr(make_cache_key, 'profiled', None)
+
+        if laps and profiled:
+            return profiled(f, args, kwargs, laps)
+
+        cache_key = make_cache_key(f, *args, **kwargs)
+
+        if laps:
+            laps('key')
+
+        return cache_key
+
+    def _memoize_profile(self, decorated, laps, hit):
+        # A coalesced call that another caller computed only waited
+        if not hit and laps.timings[-1][0] == 'get':
+            laps('wait')
+
+        decorated.profile.add(laps.timings, hit)
+
+    def profile_report(self, folded=False):
+        """
+        Renders the profiles of all memoized functions that have profiling
+        enabled (see :meth:`memoize`), either as text tables or in the folded
+        stack format used by flamegraph.pl.
+        """
+        profiles = (p for _, p in sorted(self.profiles.items()))
+        renderer = Profile.folded if folded else Profile.table
+        separator = '\n' if folded else '\n\n'
+        return separator.join(map(renderer, profiles))
+
+    def _memoize_compute(self, decorated, compute, cache_key, args, kwargs,
+                         lap=None):
+        # `lap` is called after the 'call' and 'set' phases when profiling
+        lap = lap or (lambda phase: None)
+        start = timer()
+
+        try:
+            try:
+                value = compute(*args, **kwargs)
+            finally:
+                duration = timer() - start
+                lap('call')
+        except decorated.cache_exceptions as exc:
+            self._memoize_set_negative(
+                decorated, cache_key, Negative(exception=exc), duration)
+            lap('set')
+            raise
+
+        value = self._memoize_store(decorated, cache_key, value, duration)
+        lap('set')
+        return value
+
+    def _memoize_miss(self, decorated, compute, cache_key, args, kwargs,
+                      lap=None):
+        if decorated.coalesce:
+            return self.coalescer.call(
+                cache_key, self._memoize_compute, decorated, compute,
+                cache_key, args, kwargs, lap)
+        else:
+            return self._memoize_compute(
+                decorated, compute, cache_key, args, kwargs, lap)
+
+    def _memoize_async(self, decorated, f, args, kwargs):
+        # Returns the cached value, or the task computing it. It is called
+        # (and awaited) by the coroutine function `wrap_coroutine` returns,
+        # so there is always a running event loop.
+        stats = decorated.stats
+        cache_key = decorated.make_cache_key(f, *args, **kwargs)
+        value = instrument(stats, 'get', self._memoize_get)(cache_key)
+
+        if stats:
+            stats.incr('misses' if value is None else 'hits')
+
+        if isinstance(value, Negative):
+            return value.unwrap()
+        elif value is not None:
+            return value
+
+        # futures are bound to their event loop
+        flight_key = (id(get_running_loop()), cache_key)
+        task = self.tasks.get(flight_key) if decorated.coalesce else None
+
+        if task is None:
+            task = asyncio.ensure_future(f(*args, **kwargs))
+            done = partial(self._memoize_done, decorated, cache_key, timer())
+            task.add_done_callback(done)
+
+            if decorated.coalesce:
+                self.tasks[flight_key] = task
+                pop = lambda _: self.tasks.pop(flight_key, None)
+                task.add_done_callback(pop)
+
+        # a cancelled caller shouldn't cancel the others' shared task
+        return asyncio.shield(task) if decorated.coalesce else task
+
+    def _memoize_done(self, decorated, cache_key, start, task):
+        if task.cancelled():
+            return
+
+        duration = timer() - start
+        exception = task.exception()
+
+        if decorated.stats:
+            decorated.stats.observe('compute', duration)
+
+        if exception is None:
+            self._memoize_store(decorated, cache_key, task.result(), duration)
+        elif isinstance(exception, decorated.cache_exceptions):
+            negative = Negative(exception=exception)
+            self._memoize_set_negative(
+                decorated, cache_key, negative, duration)
+
+    def _memoize_generator(self, decorated, f, args, kwargs):
+        stats = decorated.stats
+        cache_key = decorated.make_cache_key(f, *args, **kwargs)
+        header = instrument(stats, 'get', self._memoize_get)(cache_key)
+        hit = isinstance(header, Pages)
+        yielded = 0
+
+        if stats:
+            stats.incr('hits' if hit else 'misses')
+
+        if not hit:
+            items = self._gen_pages_set(decorated, f, cache_key, args, kwargs)
+        else:
+            items = self._gen_pages_get(decorated, cache_key, header)
+
+        for item in items:
+            yielded += 1
+            yield item
+
+        if hit and yielded < header.size:
+            # a page expired or was evicted, so recompute the remaining items
+            for item in islice(f(*args, **kwargs), yielded, None):
+                yield item
+
+    def _gen_pages_get(self, decorated, cache_key, header):
+        keys = ['{}.{}'.format(cache_key, pos) for pos in range(header.count)]
+        window = decorated.page_window
+
+        for pos in range(0, header.count, window):
+            pages = self._get_many(*keys[pos:pos + window], trusted=True)
+
+            for page in self._deref_many(pages):
+                if page is None:
+                    return
+
+                for item in page:
+                    yield item
+
+    def _gen_pages_set(self, decorated, f, cache_key, args, kwargs):
+        page, count, size = [], 0, 0
+        start = last = timer()
+
+        for item in f(*args, **kwargs):
+            page.append(item)
+            yield item
+
+            if len(page) >= decorated.page_size:
+                now = timer()
+                page_key = '{}.{}'.format(cache_key, count)
+                self._memoize_set(decorated, page_key, page, None, now - last)
+                page, count, size, last = [], count + 1, size + len(page), now
+
+        if page:
+            page_key = '{}.{}'.format(cache_key, count)
+            self._memoize_set(decorated, page_key, page, None, timer() - last)
+            count, size = count + 1, size + len(page)
+
+        # the header is set last so that a partially consumed result is a miss
+        header = Pages(count, size)
+        self._memoize_set(decorated, cache_key, header, None, timer() - start)
+
+    def _memoize_store(self, decorated, cache_key, value, duration=None):
+        if decorated.is_negative and decorated.is_negative(value):
+            self._memoize_set_negative(
+                decorated, cache_key, Negative(value), duration)
+        else:
+            value = self._memoize_set(
+                decorated, cache_key, value, duration=duration)
+
+        return value
+
+    def _memoize_get(self, cache_key):
+        try:
+            value = self._get(cache_key)
+        except UNPICKLING_ERRORS:
+            value = None
+
+        if isinstance(value, ContentRef):
+            value = self._deref_many([value])[0]
+
+        return value
+
+    def _deref_many(self, values):
+        # Replaces the content references with their values. Values whose
+        # content has expired are None (a miss).
+        refs = [value.key for value in values if isinstance(value, ContentRef)]
+
+        if refs:
+            contents = self._get_many(*refs, trusted=True)
+            loaded = {
+                key: pickle.loads(content) for key, content
+                in zip(refs, contents) if content is not None}
+
+            values = [
+                loaded.get(value.key) if isinstance(value, ContentRef)
+                else value for value in values]
+
+        return values
+
+    def _dedupe(self, value, timeout=None):
+        # Returns a reference to the value's content if the value is large
+        # enough to be deduplicated. The content is only written if it isn't
+        # cached already. Concurrent writers write the same bytes, so there is
+        # no need for `add`, and large contents can still be chunked (see
+        # `SpreadSASLMemcachedCache`).
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if len(pickled) < self.config['CACHE_DEDUPE_SIZE']:
+            return value
+
+        digest = hashlib.sha256(pickled).hexdigest()
+        ref = ContentRef('blob.{}'.format(digest))
+
+        if not self.cache.has(ref.key):
+            self._set(ref.key, pickled, timeout)
+
+        return ref
+
+    def _memoize_set_negative(self, decorated, cache_key, negative, duration):
+        # An exception that can't be unpickled would turn every later call
+        # into an unpickling error, so it isn't cached
+        if negative.exception is not None and not negative.round_trips():
+            return
+
+        timeout = decorated.negative_timeout
+
+        if timeout is None:
+            timeout = get_timeout(
+                decorated.cache_timeout, negative.value, duration)
+
+        self._memoize_set(decorated, cache_key, negative, timeout, duration)
+
+    def _memoize_set(self, decorated, cache_key, value, timeout=None,
+                     duration=None):
+        stats = decorated.stats
+        cache_set = instrument(stats, 'set', self._set)
+
+        if timeout is None:
+            timeout = decorated.cache_timeout
+
+        # Custom cache keys don't embed the version hashes
+        default_key = hasattr(decorated.make_cache_key, 'profiled')
+        registered = self.registry and default_key
+        dedupe = self.config['CACHE_DEDUPE_SIZE'] is not None
+
+        # value is first for addCallback compatibility
+        def set_cache(value, key):
+            ckwargs = {'timeout': get_timeout(timeout, value, duration or 0)}
+            stored = self._dedupe(value, **ckwargs) if dedupe else value
+            cache_set(key, stored, cost=duration, **ckwargs)
+
+            if registered:
+                generations = self._key_generations(key)
+                self.registry.add(generations, key, **ckwargs)
+
+            if stats:
+                stats.incr('sets')
+
+            return value
+
+        try:
+            value.addCallback(set_cache, cache_key)
+        except AttributeError:
+            set_cache(value, cache_key)
+
+        return value
+
+    def _compute_many(self, f, calls, concurrency=1, processes=False):
+        if concurrency > 1 or processes:
+            func = getattr(f, '__qualname__', f.__name__)
+            name = '{}:{}'.format(f.__module__, func)
+            args, kwargs = zip(*calls) if calls else ((), ())
+
+            with get_executor(concurrency, processes) as executor:
+                if processes:
+                    results = executor.map(
+                        time_call, repeat(call_uncached), repeat(name), args,
+                        kwargs)
+                else:
+                    results = executor.map(
+                        lambda a, kw: time_call(f.uncached, *a, **kw), args,
+                        kwargs)
+
+                values = list(results)
+        else:
+            values = [time_call(f.uncached, *a, **kw) for a, kw in calls]
+
+        # a list of (result, seconds) tuples
+        return values
+
+    def warm(self, f, arguments, concurrency=1, processes=False):
+        """
+        Precomputes the results of a memoized function and bulk writes them
+        to the cache, e.g., to avoid a thundering herd after a deploy.
+
+        Example::
+            >>> cache = Cache()
+            >>>
+            >>> @cache.memoize()
+            ... def add(a, b=1):
+            ...     return a + b
+
+        .. code-block:: python
+
+            >>> cache.warm(add, [(1, 2), (3,), {'a': 4, 'b': 5}])
+            3
+            >>> add(3)
+            4
+
+        :param f: The memoized function.
+        :param arguments: An iterable of function arguments. Each item may be a
+            tuple of positional arguments, a dict of keyword arguments, or a
+            single positional argument.
+        :param concurrency: Number of workers used to compute the results.
+        :param processes: Compute the results in a process pool instead of a
+            thread pool. `f` must then be importable from its module.
+
+        :returns: The number of cached results.
+        """
+        pending = OrderedDict()
+
+        for args, kwargs in gen_call_args(arguments):
+            cache_key = f.make_cache_key(f.uncached, *args, **kwargs)
+            pending.setdefault(cache_key, (args, kwargs))
+
+        calls = list(pending.values())
+        results = self._compute_many(f, calls, concurrency, processes)
+        return self._set_results(f, pending, results)
+
+    def _set_results(self, f, keys, results):
+        # The results are stored like memoize stores them (negative results,
+        # the key registry, stats and eviction costs included)
+        stored = []
+
+        for key, (value, duration) in zip(keys, results):
+            if value is not None:
+                self._memoize_store(f, key, value, duration)
+                stored.append(key)
+
+        if stored:
+            # other processes' local tiers may hold previous results
+            self._publish(*stored)
+
+        return len(stored)
+
+    def _memoize_get_many(self, *cache_keys):
+        # Fetches the values in one round trip, unless one of them can't be
+        # unpickled. They are then fetched one by one, so only those miss.
+        try:
+            values = self._deref_many(self.get_many(*cache_keys))
+        except UNPICKLING_ERRORS:
+            values = list(map(self._memoize_get, cache_keys))
+
+        return values
+
+    def parallel_map(self, f, arguments, concurrency=None, processes=True):
+        """
+        Returns the results of a memoized function for each of the given
+        arguments, like :func:`map`. The cached results are fetched in one
+        round trip, and the misses are computed in a process pool (so a
+        CPU-bound function can use all cores). Identical calls are only
+        computed once. The results are written to the cache from this process
+        under the same keys as :attr:`make_cache_key`, so later calls from any
+        process hit.
+
+        Example::
+            >>> cache = Cache()
+            >>>
+            >>> @cache.memoize()
+            ... def add(a, b=1):
+            ...     return a + b
+
+        .. code-block:: python
+
+            >>> cache.parallel_map(add, [(1, 2), 3, 3], processes=False)
+            [3, 4, 4]
+
+        :param f: The memoized function. `f` must be importable from its module
+            unless `processes` is False.
+        :param arguments: An iterable of function arguments (see :meth:`warm`).
+        :param concurrency: Number of workers. Defaults to the number of CPUs.
+        :param processes: Compute the results in a process pool instead of a
+            thread pool.
+
+        :returns: The list of results.
+        """
+        calls = list(gen_call_args(arguments))
+        keys = [f.make_cache_key(f.uncached, *a, **kw) for a, kw in calls]
+        unique = list(OrderedDict.fromkeys(keys))
+        cached = dict(zip(unique, self._memoize_get_many(*unique)))
+        pending = OrderedDict()
+
+        for key, call in zip(keys, calls):
+            if cached[key] is None:
+                pending.setdefault(key, call)
+
+        if f.stats:
+            f.stats.incr('hits', len(unique) - len(pending))
+            f.stats.incr('misses', len(pending))
+
+        if pending:
+            concurrency = concurrency or cpu_count()
+            calls = list(pending.values())
+            results = self._compute_many(f, calls, concurrency, processes)
+            self._set_results(f, pending, results)
+            cached.update(zip(pending, (value for value, _ in results)))
+
+        values = map(cached.get, keys)
+        return [v.unwrap() if isinstance(v, Negative) else v for v in values]
+
     def delete_memoized(self, f, *args, **kwargs):
         """
         Deletes the specified functions caches, based by given parameters.
@@ -470,7 +1860,8 @@ class Cache(object):
 
         When passing an instancemethod, it will only clear the cache related
         to that instance of that object. (object uniqueness can be overridden
-            by defining the __repr__ method, such as user id).
+            by defining the __cache_key__ or __repr__ method, such as user id,
+            or with the ``key_self`` param of :meth:`memoize`).
 
         When passing a classmethod, it will clear all caches related across
         all instances of that class.
@@ -541,10 +1932,11 @@ class Cache(object):
                 " reliable, please switch to a function reference")
 
         if not (args or kwargs):
-            self._memoize_version(f, reset=True)
+            key_self = getattr(f, 'key_self', None)
+            self._memoize_version(f, reset=True, key_self=key_self)
         else:
             cache_key = f.make_cache_key(f.uncached, *args, **kwargs)
-            self.cache.delete(cache_key)
+            self.delete(cache_key)
 
     def delete_memoized_verhash(self, f, *args):
         """
@@ -556,14 +1948,16 @@ class Cache(object):
             been created with this version hash. It is up to the application
             to make sure that all keys that may have been created with this
             version hash at least have timeouts so they will not sit orphaned
-            in the cache backend.
+            in the cache backend, or to enable `CACHE_KEY_REGISTRY` so they
+            are deleted in the background.
         """
         if not callable(f):
             raise DeprecationWarning(
                 "Deleting messages by relative name is no longer"
                 " reliable, please use a function reference")
 
-        self._memoize_version(f, delete=True)
+        key_self = getattr(f, 'key_self', None)
+        self._memoize_version(f, delete=True, key_self=key_self)
 
 
 def get_cache(*args, **kwargs):
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.__main__
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides the mezmorize command line interface
+
+    Examples:
+        python -m mezmorize warm myapp.reports:get_report --args args.json
+        echo '[[1, 2], {"a": 3}]' | python -m mezmorize warm myapp:add -c 4
+        python -m mezmorize dump myapp:cache snapshot.mzs
+        python -m mezmorize warm myapp:add --snapshot snapshot.mzs
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import sys
+import json
+
+from argparse import ArgumentParser, FileType
+
+from . import Cache
+from .utils import import_object
+
+
+def get_cache(target):
+    obj = import_object(target)
+    return obj if isinstance(obj, Cache) else obj.cache
+
+
+def warm(args):
+    if args.snapshot:
+        count = get_cache(args.target).load(args.snapshot)
+        print('Restored {} keys from {}'.format(count, args.snapshot.name))
+
+    if args.args or not args.snapshot:
+        func = import_object(args.target)
+        arguments = json.load(args.args or sys.stdin)
+        kwargs = {'concurrency': args.concurrency, 'processes': args.processes}
+        count = func.cache.warm(func, arguments, **kwargs)
+        print('Warmed {} keys for {}'.format(count, args.target))
+
+
+def dump(args):
+    count = get_cache(args.target).dump(args.snapshot, args.compress)
+    print('Dumped {} keys to {}'.format(count, args.snapshot.name))
+
+
+def load(args):
+    count = get_cache(args.target).load(args.snapshot)
+    print('Restored {} keys from {}'.format(count, args.snapshot.name))
+
+
+def get_parser():
+    description = 'Manages the contents of mezmorize caches'
+    parser = ArgumentParser(prog='mezmorize', description=description)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    warm_parser = subparsers.add_parser(
+        'warm', help='Precompute and cache the results of a memoized function')
+
+    warm_parser.add_argument(
+        'target', help='The memoized function, e.g., package.module:func')
+
+    warm_parser.add_argument(
+        '-a', '--args', type=FileType('r'),
+        help=(
+            'JSON file containing a list of function arguments. Each item is '
+            'a list of positional arguments, an object of keyword arguments, '
+            'or a single positional argument (default: stdin)'))
+
+    warm_parser.add_argument(
+        '-s', '--snapshot', type=FileType('rb'),
+        help='Restore the cache from a snapshot file instead of recomputing')
+
+    warm_parser.add_argument(
+        '-c', '--concurrency', type=int, default=1,
+        help='Number of workers used to compute the results (default: 1)')
+
+    warm_parser.add_argument(
+        '-p', '--processes', action='store_true',
+        help='Compute the results in a process pool instead of a thread pool')
+
+    warm_parser.set_defaults(func=warm)
+
+    dump_parser = subparsers.add_parser(
+        'dump', help='Write the contents of a cache to a snapshot file')
+
+    dump_parser.add_argument(
+        'target', help='The Cache or memoized function, e.g., package:cache')
+
+    dump_parser.add_argument(
+        'snapshot', type=FileType('wb'), help='The snapshot file')
+
+    dump_parser.add_argument(
+        '-u', '--uncompressed', dest='compress', action='store_false',
+        help="Don't compress the snapshot")
+
+    dump_parser.set_defaults(func=dump)
+
+    load_parser = subparsers.add_parser(
+        'load', help='Restore the contents of a cache from a snapshot file')
+
+    load_parser.add_argument(
+        'target', help='The Cache or memoized function, e.g., package:cache')
+
+    load_parser.add_argument(
+        'snapshot', type=FileType('rb'), help='The snapshot file')
+
+    load_parser.set_defaults(func=load)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.aio
+    ~~~~~~~~~~~~~
+
+    Provides the wrapper of memoized coroutine functions (kept out of the
+    other modules since the syntax is Python 3.5+ only)
+"""
+from functools import wraps
+
+from .coalesce import asyncio
+
+
+def wrap_coroutine(f, memoizer, unless=None):
+    """Returns a coroutine function that awaits the result of `memoizer`,
+    i.e., the cached value or the (possibly shared) task computing it"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        if callable(unless) and unless():  # bypass cache
+            return await f(*args, **kwargs)
+
+        result = memoizer(decorated, f, args, kwargs)
+
+        if isinstance(result, asyncio.Future):
+            result = await result
+
+        return result
+
+    return decorated
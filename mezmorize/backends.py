@@ -12,35 +12,59 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals)
 
+import os
 import pickle
 
-from itertools import chain
+from heapq import heappush, heappop, heapify
+from threading import Lock, RLock
+from collections import OrderedDict
+from time import time
+from tempfile import mkstemp
+from itertools import chain, islice
 from functools import partial
 from operator import contains
+from zlib import crc32
 
+from six import text_type
 from six.moves import filter
 
+from werkzeug.posixemulation import rename
 from werkzeug.contrib.cache import (
-    NullCache, SimpleCache, MemcachedCache as _MemcachedCache, FileSystemCache,
-    RedisCache)
+    BaseCache, NullCache, SimpleCache as _SimpleCache,
+    MemcachedCache as _MemcachedCache, FileSystemCache as _FileSystemCache,
+    RedisCache as _RedisCache)
 
+from .breaker import BACKEND_ERRORS
 from .utils import (
     DEF_MC_SERVERS, HAS_MEMCACHE, AVAIL_MEMCACHES, get_pylibmc_client,
     get_pymemcache_client, get_bmemcached_client, DEF_REDIS_HOST,
-    DEF_REDIS_PORT)
+    DEF_REDIS_PORT, DEF_SOCKET_TIMEOUT, ENCODING, decode, get_executor,
+    import_object, pylibmc)
 
 try:
     from redis import from_url
 except ImportError:
     from_url = None
 
+try:
+    from concurrent.futures import FIRST_COMPLETED, wait
+except ImportError:
+    wait = None
+
+DEF_SHARDS = 16
+DEF_REPLICAS = 2
+
+# pylibmc raises an error when incrementing a missing key
+MC_NOT_FOUND = (pylibmc.NotFound,) if pylibmc else ()
+
 CONFIG_LOOKUP = {
     'servers': 'CACHE_MEMCACHED_SERVERS',
     'threshold': 'CACHE_THRESHOLD',
     'username': 'CACHE_MEMCACHED_USERNAME',
     'password': 'CACHE_MEMCACHED_PASSWORD',
     'key_prefix': 'CACHE_KEY_PREFIX',
-    'timeout': 'connect_timeout'}
+    'timeout': 'connect_timeout',
+    'socket_timeout': 'CACHE_SOCKET_TIMEOUT'}
 
 
 def gen_defaults(*keys, **config):
@@ -53,45 +77,64 @@ def gen_defaults(*keys, **config):
 
 def get_mc_client(module_name, binary=True, **kwargs):
     servers = kwargs.pop('servers', (DEF_MC_SERVERS,))
-    timeout = kwargs.pop('timeout', None)
+    kwargs.setdefault('timeout', None)
 
     if module_name == 'pylibmc':
-        client = get_pylibmc_client(
-            servers, timeout=timeout, binary=binary, **kwargs)
+        client = get_pylibmc_client(servers, binary=binary, **kwargs)
     elif module_name == 'pymemcache':
-        client = get_pymemcache_client(servers, timeout=timeout, **kwargs)
+        client = get_pymemcache_client(servers, **kwargs)
     elif module_name == 'bmemcached':
-        client = get_bmemcached_client(servers, timeout=timeout, **kwargs)
+        client = get_bmemcached_client(servers, **kwargs)
 
     return client
 
 
-class MemcachedCache(_MemcachedCache):
-    def __init__(self, *args, **kwargs):
-        if not HAS_MEMCACHE:
-            raise RuntimeError('No memcache module found.')
+def get_preferred_mc(compat_memcaches=AVAIL_MEMCACHES, preferred_mc=None):
+    if not HAS_MEMCACHE:
+        raise RuntimeError('No memcache module found.')
 
-        compat_memcaches = kwargs.pop('compat_memcaches', AVAIL_MEMCACHES)
-        avail_memcaches = set(AVAIL_MEMCACHES).intersection(compat_memcaches)
+    avail_memcaches = set(AVAIL_MEMCACHES).intersection(compat_memcaches)
+
+    if not avail_memcaches:
+        raise RuntimeError('No compatible memcache module found.')
 
-        if not avail_memcaches:
-            raise RuntimeError('No compatible memcache module found.')
+    if len(avail_memcaches) == 1 or preferred_mc not in avail_memcaches:
+        filterer = partial(contains, avail_memcaches)
+        preferred_mc = next(filter(filterer, AVAIL_MEMCACHES))
 
-        preferred_mc = kwargs.get('preferred_memcache', 'pylibmc')
+    return preferred_mc
 
-        if len(avail_memcaches) == 1 or preferred_mc not in avail_memcaches:
-            filterer = partial(contains, avail_memcaches)
-            preferred_mc = next(filter(filterer, AVAIL_MEMCACHES))
 
+class MemcachedCache(_MemcachedCache):
+    """
+    Kwargs:
+        client: A memcache client to use instead of connecting to `servers`
+            (e.g., a stand-in). It needs a `TooBig` attribute.
+    """
+    def __init__(self, *args, **kwargs):
+        compat_memcaches = kwargs.pop('compat_memcaches', AVAIL_MEMCACHES)
+        client = kwargs.pop('client', None)
         whitelist = {'default_timeout', 'key_prefix'}
         blacklist = whitelist.union(['preferred_memcache'])
         mkwargs = {k: v for k, v in kwargs.items() if k not in blacklist}
         skwargs = {k: v for k, v in kwargs.items() if k in whitelist}
 
-        client = get_mc_client(preferred_mc, **mkwargs)
+        if client is None:
+            preferred_mc = kwargs.get('preferred_memcache', 'pylibmc')
+            client_name = get_preferred_mc(compat_memcaches, preferred_mc)
+            client = get_mc_client(client_name, **mkwargs)
+        else:
+            client_name = type(client).__module__.split('.')[0]
+
         super(MemcachedCache, self).__init__(servers=client, **skwargs)
         self.TooBig = client.TooBig
-        self.client_name = preferred_mc
+        self.client_name = client_name
+
+    def inc(self, key, delta=1):
+        try:
+            return super(MemcachedCache, self).inc(key, delta)
+        except MC_NOT_FOUND:
+            return None
 
 
 class SASLMemcachedCache(MemcachedCache):
@@ -100,6 +143,643 @@ class SASLMemcachedCache(MemcachedCache):
         super(SASLMemcachedCache, self).__init__(*args, **kwargs)
 
 
+# The snapshot primitives below work with `(key, expires, pickled)` items where
+# `expires` is an absolute timestamp (0 if the item never expires) and
+# `pickled` is the pickled value.
+class SimpleCache(_SimpleCache):
+    hashed_keys = False
+
+    def __init__(self, *args, **kwargs):
+        super(SimpleCache, self).__init__(*args, **kwargs)
+
+        # makes `add` and `inc` atomic, like in the remote backends (and
+        # guards the eviction bookkeeping of the subclasses)
+        self._lock = RLock()
+
+        # werkzeug binds `clear` to the dict on the instance, which would
+        # shadow the overrides (and outlive subclasses replacing the dict)
+        vars(self).pop('clear', None)
+
+    def add(self, key, value, timeout=None, **kwargs):
+        with self._lock:
+            return not self.has(key) and self.set(
+                key, value, timeout, **kwargs)
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            return super(SimpleCache, self).inc(key, delta)
+
+    def dec(self, key, delta=1):
+        with self._lock:
+            return super(SimpleCache, self).dec(key, delta)
+
+    def delete_many(self, *keys):
+        # werkzeug's version stops at the first missing key
+        return all([self.delete(key) for key in keys])
+
+    def _prune(self):
+        # werkzeug's version iterates over the dict itself, which raises a
+        # RuntimeError if another thread adds or removes a key meanwhile
+        if len(self._cache) > self._threshold:
+            now = time()
+
+            for pos, (key, item) in enumerate(list(self._cache.items())):
+                if (item[0] != 0 and item[0] <= now) or pos % 3 == 0:
+                    self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+        return True
+
+    def iter_items(self):
+        now = time()
+
+        for key, (expires, pickled) in list(self._cache.items()):
+            if expires == 0 or expires > now:
+                yield key, expires, pickled
+
+    def set_items(self, items):
+        count = 0
+        now = time()
+
+        for key, expires, pickled in items:
+            if expires == 0 or expires > now:
+                self._store(key, expires, pickled)
+                count += 1
+
+        return count
+
+    def _expires(self, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+
+        return time() + timeout if timeout > 0 else 0
+
+    def _store(self, key, expires, pickled, **kwargs):
+        self._prune()
+        self._cache[key] = (expires, pickled)
+
+
+class LRUCache(SimpleCache):
+    """
+    A SimpleCache that evicts the least recently used item once it holds
+    `threshold` items.
+    """
+    def __init__(self, *args, **kwargs):
+        super(LRUCache, self).__init__(*args, **kwargs)
+        self._cache = OrderedDict()
+
+    def _prune(self):
+        while self._cache and len(self._cache) >= self._threshold:
+            self._cache.popitem(last=False)
+
+    def _store(self, key, expires, pickled, **kwargs):
+        with self._lock:
+            self._cache.pop(key, None)
+            super(LRUCache, self)._store(key, expires, pickled)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                item = self._cache[key] = self._cache.pop(key)
+            except KeyError:
+                return None
+
+        if item[0] == 0 or item[0] > time():
+            return pickle.loads(item[1])
+
+    def set(self, key, value, timeout=None):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._store(key, self._expires(timeout), pickled)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+
+class GDSFCache(SimpleCache):
+    """
+    A SimpleCache that evicts the items with the lowest priority first
+    (Greedy-Dual-Size-Frequency), where
+
+        priority = clock + hits * cost / size
+
+    `cost` is the time it took to compute the item (as measured by memoize),
+    `size` is its pickled length, and `clock` is raised to the priority of
+    each evicted item so that items that are no longer requested age out.
+    Items set without a cost (e.g., version hashes) cost `default_cost`.
+    """
+    cost_aware = True
+
+    def __init__(self, threshold=500, default_timeout=300, default_cost=1):
+        super(GDSFCache, self).__init__(threshold, default_timeout)
+        self.default_cost = default_cost
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._meta = {}
+            self._heap = []
+            self.clock = 0
+            return super(GDSFCache, self).clear()
+
+    def _prioritize(self, key, hits, cost, size):
+        priority = self.clock + hits * cost / size
+        self._meta[key] = (priority, hits, cost, size)
+        heappush(self._heap, (priority, key))
+
+        # drop the heap's stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._meta) + self._threshold:
+            self._heap = [(meta[0], k) for k, meta in self._meta.items()]
+            heapify(self._heap)
+
+    def _prune(self):
+        while len(self._cache) >= self._threshold and self._heap:
+            priority, key = heappop(self._heap)
+            meta = self._meta.get(key)
+
+            if meta and meta[0] == priority:
+                self.clock = priority
+                self.delete(key)
+
+    def _store(self, key, expires, pickled, cost=None):
+        cost = self.default_cost if cost is None else cost
+
+        with self._lock:
+            self.delete(key)
+            super(GDSFCache, self)._store(key, expires, pickled)
+            self._prioritize(key, 1, cost, len(pickled) or 1)
+
+    def get(self, key):
+        value = super(GDSFCache, self).get(key)
+
+        if value is None:
+            return None
+
+        with self._lock:
+            meta = self._meta.get(key)
+
+            # another thread may have evicted it meanwhile
+            if meta:
+                _, hits, cost, size = meta
+                self._prioritize(key, hits + 1, cost, size)
+
+        return value
+
+    def set(self, key, value, timeout=None, cost=None):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._store(key, self._expires(timeout), pickled, cost)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._meta.pop(key, None)
+            return self._cache.pop(key, None) is not None
+
+
+EVICTION_POLICIES = {None: SimpleCache, 'lru': LRUCache, 'gdsf': GDSFCache}
+
+
+def get_simple_cls(eviction=None):
+    try:
+        return EVICTION_POLICIES[eviction]
+    except KeyError:
+        raise ValueError('Unknown eviction policy {}.'.format(eviction))
+
+
+class StripedCache(BaseCache):
+    """
+    A thread safe in-process cache made of `shards` independently locked
+    SimpleCaches (of the given eviction policy), so that threads working on
+    keys in different shards don't contend for the same lock. Each shard holds
+    up to `threshold / shards` items.
+    """
+    hashed_keys = False
+
+    def __init__(self, threshold=500, default_timeout=300, shards=16,
+                 eviction=None):
+        super(StripedCache, self).__init__(default_timeout)
+        cache_cls = get_simple_cls(eviction)
+        shard_threshold = max(threshold // shards, 1)
+        self.cost_aware = getattr(cache_cls, 'cost_aware', False)
+        self.locks = [Lock() for _ in range(shards)]
+        self.shards = [
+            cache_cls(shard_threshold, default_timeout) for _ in range(shards)]
+
+    def _locate(self, key):
+        pos = hash(key) % len(self.shards)
+        return self.locks[pos], self.shards[pos]
+
+    def _call(self, method, key, *args, **kwargs):
+        lock, shard = self._locate(key)
+
+        with lock:
+            return getattr(shard, method)(key, *args, **kwargs)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, value, timeout=None, **kwargs):
+        return self._call('set', key, value, timeout, **kwargs)
+
+    def add(self, key, value, timeout=None, **kwargs):
+        return self._call('add', key, value, timeout, **kwargs)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+    def delete_many(self, *keys):
+        return all([self.delete(key) for key in keys])
+
+    def has(self, key):
+        return self._call('has', key)
+
+    def inc(self, key, delta=1):
+        return self._call('inc', key, delta)
+
+    def dec(self, key, delta=1):
+        return self._call('dec', key, delta)
+
+    def clear(self):
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.clear()
+
+        return True
+
+    def iter_items(self):
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                items = list(shard.iter_items())
+
+            for item in items:
+                yield item
+
+    def set_items(self, items):
+        count = 0
+
+        for item in items:
+            lock, shard = self._locate(item[0])
+
+            with lock:
+                count += shard.set_items([item])
+
+        return count
+
+
+class ReplicatedCache(BaseCache):
+    """
+    A cache that writes each key to `replicas` of the given nodes (backends
+    of a single server each), and reads it from the first of them. If the node
+    fails, the read moves on to the next replica. If `hedge_delay` is set and
+    the node hasn't answered after `hedge_delay` seconds, the read is also
+    sent to the next replica and the first response wins. This cuts the tail
+    latency caused by a single slow node.
+
+    Since `add`, `inc` and `dec` only run on the first node that responds,
+    their result is copied to the other replicas with the given `timeout`.
+    """
+    hashed_keys = False
+    copies_counters = True
+
+    def __init__(self, nodes, replicas=DEF_REPLICAS, hedge_delay=None,
+                 default_timeout=300):
+        super(ReplicatedCache, self).__init__(default_timeout)
+        self.nodes = nodes
+        self.replicas = max(1, min(replicas, len(nodes)))
+        self.hedge_delay = hedge_delay
+
+        if hedge_delay is None:
+            self.executor = None
+        else:
+            self.executor = get_executor(2 * len(nodes))
+
+        # so that Cache recreates the nodes in forked child processes
+        self._client = [getattr(node, '_client', None) for node in nodes]
+
+    def _locate(self, key):
+        # Returns the positions of the key's nodes. The replicas follow the
+        # first node (chosen by hash) on a ring.
+        encoded = key.encode(ENCODING) if isinstance(key, text_type) else key
+        first = crc32(encoded) % len(self.nodes)
+        return tuple(
+            (first + pos) % len(self.nodes) for pos in range(self.replicas))
+
+    def _group(self, keys):
+        groups = OrderedDict()
+
+        for key in keys:
+            groups.setdefault(self._locate(key), []).append(key)
+
+        return groups
+
+    def _failover(self, method, positions, *args):
+        for pos in positions[:-1]:
+            try:
+                return getattr(self.nodes[pos], method)(*args)
+            except BACKEND_ERRORS:
+                pass
+
+        return getattr(self.nodes[positions[-1]], method)(*args)
+
+    def _launch(self, method, groups, group, tried, futures):
+        # Sends the group's call to its next untried node (if any)
+        positions, args = groups[group]
+
+        if tried[group] < len(positions):
+            node = self.nodes[positions[tried[group]]]
+            future = self.executor.submit(getattr(node, method), *args)
+            futures[future] = group
+            tried[group] += 1
+
+    def _hedge(self, method, groups):
+        # Calls `method` on the first node of each group, and on the group's
+        # next node whenever `hedge_delay` passes without a response (or the
+        # call fails). Returns the first result of each group.
+        results = [None] * len(groups)
+        tried = [0] * len(groups)
+        pending = set(range(len(groups)))
+        futures, errors = {}, {}
+        launch = partial(self._launch, method, groups, tried=tried,
+                         futures=futures)
+
+        for group in pending:
+            launch(group)
+
+        while pending and futures:
+            done = wait(futures, self.hedge_delay, FIRST_COMPLETED)[0]
+
+            for group in ([] if done else pending):
+                launch(group)
+
+            for future in done:
+                group = futures.pop(future)
+                error = future.exception()
+
+                if group not in pending:
+                    pass
+                elif error is None:
+                    results[group] = future.result()
+                    pending.discard(group)
+                elif isinstance(error, BACKEND_ERRORS):
+                    errors[group] = error
+                    launch(group)
+                else:
+                    raise error
+
+        if pending:
+            raise errors[pending.pop()]
+
+        return results
+
+    def _read(self, method, groups):
+        if self.executor:
+            results = self._hedge(method, groups)
+        else:
+            results = [
+                self._failover(method, positions, *args)
+                for positions, args in groups]
+
+        return results
+
+    def _write(self, method, positions, *args):
+        # Writes to every node, and only fails if all of them did
+        results, error = [], None
+
+        for pos in positions:
+            try:
+                results.append(getattr(self.nodes[pos], method)(*args))
+            except BACKEND_ERRORS as exc:
+                error = exc
+
+        if error and not results:
+            raise error
+
+        return all(results)
+
+    def _first_write(self, method, key, arg, timeout=None):
+        # Calls `method` on the first node that responds, then copies the
+        # resulting value to the other replicas
+        positions = self._locate(key)
+        args = (arg, timeout) if method == 'add' else (arg,)
+
+        for count, pos in enumerate(positions, 1):
+            try:
+                result = getattr(self.nodes[pos], method)(key, *args)
+                break
+            except BACKEND_ERRORS:
+                if count == len(positions):
+                    raise
+
+        value = arg if method == 'add' else result
+
+        if result is not None and result is not False:
+            self._write('set', positions[count:], key, value, timeout)
+
+        return result
+
+    def get(self, key):
+        return self._read('get', [(self._locate(key), (key,))])[0]
+
+    def get_many(self, *keys):
+        groups = [
+            (positions, tuple(grouped))
+            for positions, grouped in self._group(keys).items()]
+        results = self._read('get_many', groups)
+        mapping = {}
+
+        for (_, group_keys), values in zip(groups, results):
+            mapping.update(zip(group_keys, values))
+
+        return [mapping[key] for key in keys]
+
+    def has(self, key):
+        return self._read('has', [(self._locate(key), (key,))])[0]
+
+    def set(self, key, value, timeout=None):
+        return self._write('set', self._locate(key), key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._first_write('add', key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        groups = self._group(mapping)
+
+        return all([
+            self._write(
+                'set_many', positions, {k: mapping[k] for k in grouped},
+                timeout)
+            for positions, grouped in groups.items()])
+
+    def delete(self, key):
+        return self._write('delete', self._locate(key), key)
+
+    def delete_many(self, *keys):
+        groups = self._group(keys)
+
+        return all([
+            self._write('delete_many', positions, *grouped)
+            for positions, grouped in groups.items()])
+
+    def inc(self, key, delta=1, timeout=None):
+        return self._first_write('inc', key, delta, timeout)
+
+    def dec(self, key, delta=1, timeout=None):
+        return self._first_write('dec', key, delta, timeout)
+
+    def clear(self):
+        return self._write('clear', range(len(self.nodes)))
+
+
+class FileSystemCache(_FileSystemCache):
+    """
+    FileSystemCache only stores the md5 hash of each key, so its items are
+    keyed by file name and can only be restored into another FileSystemCache.
+    """
+    hashed_keys = True
+
+    def delete_many(self, *keys):
+        # werkzeug's version stops at the first missing key
+        return all([self.delete(key) for key in keys])
+
+    def add(self, key, value, timeout=None):
+        # werkzeug's version checks if the file exists and then sets it, so
+        # concurrent callers can all "add" the key. Instead, the value is
+        # written to a temp file which is then hard linked in place, which
+        # fails if the file already exists.
+        if not hasattr(os, 'link'):
+            return super(FileSystemCache, self).add(key, value, timeout)
+        elif self.has(key):
+            return False
+
+        self._prune()
+        filename = self._get_filename(key)
+        expires = self._normalize_timeout(timeout)
+        fd, tmp = mkstemp(suffix=self._fs_transaction_suffix, dir=self._path)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(expires, f, 1)
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+            os.chmod(tmp, self._mode)
+            os.link(tmp, filename)
+        except (IOError, OSError):
+            return False
+        finally:
+            os.remove(tmp)
+
+        self._update_count(delta=1)
+        return True
+
+    def iter_items(self):
+        now = time()
+
+        for filename in self._list_dir():
+            try:
+                with open(filename, 'rb') as f:
+                    expires = pickle.load(f)
+                    pickled = f.read()
+            except Exception:
+                # cache_dir may contain files that weren't written by us
+                continue
+
+            if expires == 0 or expires >= now:
+                yield os.path.basename(filename), expires, pickled
+
+    def set_items(self, items):
+        count = 0
+        now = time()
+
+        for key, expires, pickled in items:
+            filename = os.path.join(self._path, key)
+            suffix = self._fs_transaction_suffix
+
+            if expires and expires < now:
+                continue
+
+            try:
+                fd, tmp = mkstemp(suffix=suffix, dir=self._path)
+
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(int(expires), f, 1)
+                    f.write(pickled)
+
+                rename(tmp, filename)
+                os.chmod(filename, self._mode)
+            except (IOError, OSError):
+                continue
+            else:
+                count += 1
+
+        if count:
+            # keeps the file count (and thus pruning) in sync, like `set`
+            self._update_count(delta=count)
+
+        return count
+
+
+class RedisCache(_RedisCache):
+    hashed_keys = False
+
+    def iter_items(self, batch_size=100):
+        prefix = self.key_prefix
+        keys = self._client.scan_iter(match=prefix + '*', count=batch_size)
+        chunk = list(islice(keys, batch_size))
+
+        while chunk:
+            pipe = self._client.pipeline(transaction=False)
+
+            for key in chunk:
+                pipe.get(key)
+                pipe.pttl(key)
+
+            # keys of other types (e.g., sets) fail with WRONGTYPE
+            results = pipe.execute(raise_on_error=False)
+            now = time()
+
+            for i, key in enumerate(chunk):
+                value, pttl = results[2 * i], results[2 * i + 1]
+
+                if isinstance(value, Exception):
+                    continue
+                elif value is not None:
+                    expires = now + pttl / 1000 if pttl > 0 else 0
+                    pickled = pickle.dumps(
+                        self.load_object(value), pickle.HIGHEST_PROTOCOL)
+
+                    yield decode(key)[len(prefix):], expires, pickled
+
+            chunk = list(islice(keys, batch_size))
+
+    def set_items(self, items, batch_size=100):
+        pipe = self._client.pipeline(transaction=False)
+        count = 0
+
+        for key, expires, pickled in items:
+            name = self.key_prefix + key
+            dump = self.dump_object(pickle.loads(pickled))
+            ttl = int((expires - time()) * 1000)
+
+            if not expires:
+                pipe.set(name=name, value=dump)
+            elif ttl > 0:
+                pipe.psetex(name, ttl, dump)
+            else:
+                continue
+
+            count += 1
+
+            if not count % batch_size:
+                pipe.execute()
+
+        pipe.execute()
+        return count
+
+
 def null(config, *args, **kwargs):
     return NullCache()
 
@@ -107,18 +787,29 @@ def null(config, *args, **kwargs):
 def simple(config, *args, **kwargs):
     defaults = dict(gen_defaults('threshold', **config))
     defaults.update(kwargs)
-    return SimpleCache(*args, **defaults)
+    cache_cls = get_simple_cls(config.get('CACHE_EVICTION'))
+    return cache_cls(*args, **defaults)
+
+
+def striped(config, *args, **kwargs):
+    defaults = dict(gen_defaults('threshold', **config))
+    defaults['shards'] = config.get('CACHE_SHARDS', DEF_SHARDS)
+    defaults['eviction'] = config.get('CACHE_EVICTION')
+    defaults.update(kwargs)
+    return StripedCache(*args, **defaults)
 
 
 def memcached(config, *args, **kwargs):
-    keys = ('timeout', 'servers', 'key_prefix')
+    keys = ('timeout', 'socket_timeout', 'servers', 'key_prefix')
     defaults = dict(gen_defaults(*keys, **config))
     defaults.update(kwargs)
     return MemcachedCache(*args, **defaults)
 
 
 def saslmemcached(config, **kwargs):
-    keys = ('timeout', 'servers', 'username', 'password', 'key_prefix')
+    keys = (
+        'timeout', 'socket_timeout', 'servers', 'username', 'password',
+        'key_prefix')
     defaults = dict(gen_defaults(*keys, **config))
     defaults.update(kwargs)
     return SASLMemcachedCache(**defaults)
@@ -137,14 +828,49 @@ def redis(config, *args, **kwargs):
     kwargs.setdefault('password', config.get('CACHE_REDIS_PASSWORD'))
     kwargs.setdefault('key_prefix', config.get('CACHE_KEY_PREFIX'))
     kwargs.setdefault('db', config.get('CACHE_REDIS_DB'))
+    socket_timeout = config.get('CACHE_SOCKET_TIMEOUT', DEF_SOCKET_TIMEOUT)
+    kwargs.setdefault('socket_timeout', socket_timeout)
+    kwargs.setdefault('socket_connect_timeout', socket_timeout)
     redis_url = config.get('CACHE_REDIS_URL')
 
     if redis_url:
-        kwargs['host'] = from_url(redis_url, db=kwargs.pop('db', None))
+        kwargs['host'] = from_url(
+            redis_url, db=kwargs.pop('db', None),
+            socket_timeout=kwargs.pop('socket_timeout'),
+            socket_connect_timeout=kwargs.pop('socket_connect_timeout'))
 
     return RedisCache(*args, **kwargs)
 
 
+def replicated(config, *args, **kwargs):
+    """
+    Creates a ReplicatedCache with a node for each of the servers in
+    `CACHE_MEMCACHED_SERVERS`. The nodes are created by the
+    `CACHE_REPLICA_TYPE` factory (memcached by default). Redis servers may be
+    given as urls or 'host:port' pairs.
+    """
+    node_type = config.get('CACHE_REPLICA_TYPE', 'memcached')
+
+    if '.' not in node_type:
+        node_type = '{}.{}'.format(__name__, node_type)
+
+    factory = import_object(node_type)
+    servers = config.get('CACHE_MEMCACHED_SERVERS') or [DEF_MC_SERVERS]
+    nodes = []
+
+    for server in servers:
+        url = server if '://' in server else 'redis://' + server
+        node_config = dict(
+            config, CACHE_MEMCACHED_SERVERS=[server], CACHE_REDIS_URL=url)
+
+        nodes.append(factory(node_config, *args, **dict(kwargs)))
+
+    return ReplicatedCache(
+        nodes, replicas=config.get('CACHE_REPLICAS', DEF_REPLICAS),
+        hedge_delay=config.get('CACHE_HEDGE_DELAY'),
+        default_timeout=kwargs.get('default_timeout', 300))
+
+
 class SpreadSASLMemcachedCache(SASLMemcachedCache):
     """
     Simple Subclass of SASLMemcached client that spread value across multiple
@@ -220,7 +946,9 @@ class SpreadSASLMemcachedCache(SASLMemcachedCache):
 
 
 def spreadsaslmemcached(config, *args, **kwargs):
-    keys = ('timeout', 'servers', 'username', 'password', 'key_prefix')
+    keys = (
+        'timeout', 'socket_timeout', 'servers', 'username', 'password',
+        'key_prefix')
     defaults = dict(gen_defaults(*keys, **config))
     defaults.update(kwargs)
     return SpreadSASLMemcachedCache(*args, **defaults)
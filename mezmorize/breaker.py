@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.breaker
+    ~~~~~~~~~~~~~~~~~
+
+    Provides a circuit breaker for the remote (memcached and redis) backends
+
+    A breaker keeps a cache outage from becoming a latency incident. Failed
+    lookups and stores are treated as cache misses, and once too many of the
+    recent calls failed (or were slow), the breaker "opens" and skips the
+    backend entirely so memoized functions are computed directly. After
+    `reset_timeout` seconds a single probe call is let through, and the
+    breaker closes again if it succeeds.
+
+    Bulk lookups and the writes that invalidate entries (deletes, bulk sets,
+    counter updates and clears) raise `BackendUnavailable` instead, so a
+    failure isn't mistaken for missing keys, and lost invalidations don't go
+    unnoticed.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from collections import deque
+from threading import Lock
+from timeit import default_timer as timer
+
+from six import raise_from
+
+from .utils import pylibmc, pymemcache, redis
+
+BACKEND_ERRORS = (IOError, OSError, EOFError)
+
+if pylibmc:
+    BACKEND_ERRORS += (pylibmc.Error,)
+
+if pymemcache:
+    from pymemcache.exceptions import (
+        MemcacheServerError, MemcacheUnexpectedCloseError)
+
+    BACKEND_ERRORS += (MemcacheServerError, MemcacheUnexpectedCloseError)
+
+if redis:
+    from redis.exceptions import ConnectionError, TimeoutError
+
+    BACKEND_ERRORS += (ConnectionError, TimeoutError)
+
+
+class BackendUnavailable(Exception):
+    """Raised when a guarded call failed, or was skipped by an open breaker"""
+    pass
+
+
+class CircuitBreaker(object):
+    """Wraps a backend so that its failures turn into cache misses.
+
+    Args:
+        cache: The backend to guard.
+        error_rate (float): The share of failed calls (within the window) that
+            opens the breaker.
+        window (int): The number of recent calls to compute the error rate
+            from.
+        slow_call (float): The number of seconds after which a (successful)
+            call counts as failed. Disabled by default.
+        reset_timeout (float): The number of seconds to wait before probing
+            an open breaker.
+
+    Examples:
+        >>> from mezmorize.backends import SimpleCache
+        >>>
+        >>> breaker = CircuitBreaker(SimpleCache(), window=2)
+        >>> breaker.state
+        'closed'
+        >>> breaker.get('key')
+        >>> breaker.record(True)
+        >>> breaker.record(True)
+        >>> breaker.state
+        'open'
+    """
+    def __init__(self, cache, error_rate=0.5, window=20, slow_call=None,
+                 reset_timeout=30):
+        self._cache = cache
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.results = deque(maxlen=window)
+        self.opened = None
+        self.probing = False
+        self.lock = Lock()
+
+        too_big = getattr(cache, 'TooBig', None)
+        self.too_big = too_big if isinstance(too_big, tuple) else (
+            (too_big,) if too_big else ())
+
+    def __getattr__(self, name):
+        # everything else is passed through unguarded
+        if name == '_cache':
+            raise AttributeError(name)
+
+        return getattr(self._cache, name)
+
+    @property
+    def state(self):
+        if self.opened is None:
+            state = 'closed'
+        elif self.probing:
+            state = 'half-open'
+        else:
+            state = 'open'
+
+        return state
+
+    def allow(self):
+        """Returns True if a call may go through to the backend"""
+        if self.opened is None:
+            return True
+
+        with self.lock:
+            if self.opened is None:
+                allowed = True
+            elif self.probing:
+                allowed = False
+            elif timer() - self.opened >= self.reset_timeout:
+                allowed = self.probing = True
+            else:
+                allowed = False
+
+        return allowed
+
+    def record(self, failed):
+        """Records the outcome of a call"""
+        with self.lock:
+            if self.probing:
+                self.probing = False
+                self.opened = timer() if failed else None
+            elif self.opened is None:
+                results = self.results
+                results.append(failed)
+                full = len(results) == results.maxlen
+
+                if full and sum(results) >= self.error_rate * len(results):
+                    self.opened = timer()
+                    results.clear()
+
+    def call(self, func, *args, **kwargs):
+        """Calls `func`, raising `BackendUnavailable` if the breaker is open or
+        the call fails"""
+        if not self.allow():
+            raise BackendUnavailable('The circuit breaker is open.')
+
+        start = timer()
+        failed = False
+
+        try:
+            value = func(*args, **kwargs)
+        except self.too_big:
+            # the value is at fault, not the backend
+            raise
+        except BACKEND_ERRORS as exc:
+            failed = True
+            raise_from(BackendUnavailable(exc), exc)
+        else:
+            failed = bool(self.slow_call and timer() - start > self.slow_call)
+        finally:
+            # any outcome (even an unexpected error) ends a probe
+            self.record(failed)
+
+        return value
+
+    def fail_open(self, fallback, func, *args, **kwargs):
+        """Like `call`, but returns `fallback` instead of raising"""
+        try:
+            return self.call(func, *args, **kwargs)
+        except BackendUnavailable:
+            return fallback
+
+    def get(self, key):
+        return self.fail_open(None, self._cache.get, key)
+
+    def get_many(self, *keys):
+        return self.call(self._cache.get_many, *keys)
+
+    def has(self, key):
+        return self.fail_open(False, self._cache.has, key)
+
+    def set(self, *args, **kwargs):
+        return self.fail_open(False, self._cache.set, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self.fail_open(False, self._cache.add, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self.call(self._cache.set_many, *args, **kwargs)
+
+    def delete(self, key):
+        return self.call(self._cache.delete, key)
+
+    def delete_many(self, *keys):
+        return self.call(self._cache.delete_many, *keys)
+
+    def inc(self, *args, **kwargs):
+        return self.call(self._cache.inc, *args, **kwargs)
+
+    def dec(self, *args, **kwargs):
+        return self.call(self._cache.dec, *args, **kwargs)
+
+    def clear(self):
+        return self.call(self._cache.clear)
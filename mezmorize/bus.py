@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.bus
+    ~~~~~~~~~~~~~
+
+    Provides invalidation buses used to keep the local cache tiers of
+    separate processes in sync
+
+    Messages are dicts with the keys `origin` (the uid of the publishing
+    Cache) and `keys` (a list of invalidated keys, or None if the whole cache
+    was cleared).
+
+    The listener threads survive bad messages (which are logged and skipped)
+    and lost connections (which are retried). Since threads don't survive a
+    fork, buses resubscribe in forked child processes (Python 3.7+).
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import os
+import json
+import errno
+import socket
+import logging
+
+from glob import glob
+from threading import Thread
+from tempfile import gettempdir
+from time import sleep
+from weakref import WeakSet
+
+from six import string_types
+
+from .utils import decode
+
+try:
+    from redis import from_url
+except ImportError:
+    from_url = None
+
+DEF_CHANNEL = 'mezmorize.invalidations'
+DEF_BUS_DIR = os.path.join(gettempdir(), 'mezmorize-bus')
+
+# Max number of keys per datagram
+BATCH_SIZE = 256
+
+# Seconds to wait before listening again after a connection error
+RECONNECT_DELAY = 1
+
+logger = logging.getLogger(__name__)
+
+# The buses with subscribers
+BUSES = WeakSet()
+
+
+def _after_fork():
+    for bus in list(BUSES):
+        bus.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def dumps(message):
+    keys = message['keys']
+
+    if keys is not None:
+        message = dict(message, keys=list(map(decode, keys)))
+
+    return json.dumps(message).encode('utf-8')
+
+
+def loads(payload):
+    return json.loads(decode(payload))
+
+
+def gen_batches(message, batch_size=BATCH_SIZE):
+    keys = message['keys']
+
+    if keys is None:
+        yield message
+    else:
+        for pos in range(0, len(keys), batch_size):
+            yield dict(message, keys=keys[pos:pos + batch_size])
+
+
+class Bus(object):
+    """Base invalidation bus"""
+    def __init__(self):
+        self.callbacks = []
+
+    def publish(self, message):
+        raise NotImplementedError
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+        BUSES.add(self)
+
+    def dispatch(self, message):
+        for callback in self.callbacks:
+            callback(message)
+
+    def receive(self, payload):
+        """Dispatches a received payload, logging (instead of raising) any
+        error so that the listener keeps running"""
+        try:
+            self.dispatch(loads(payload))
+        except Exception:
+            logger.exception('Failed to handle a bus message.')
+
+    def after_fork(self):
+        """Called in forked child processes"""
+        pass
+
+    def close(self):
+        self.callbacks = []
+
+
+class LocalBus(Bus):
+    """A bus that delivers messages to the subscribers in this process"""
+    def publish(self, message):
+        self.dispatch(message)
+
+
+class UnixSocketBus(Bus):
+    """A bus for processes on the same host. Every subscriber binds a datagram
+    UNIX socket in `directory`, and every message is sent to all sockets found
+    there.
+    """
+    def __init__(self, directory=DEF_BUS_DIR):
+        super(UnixSocketBus, self).__init__()
+        self.directory = directory
+        self.path = None
+        self.socket = None
+
+        try:
+            os.makedirs(directory)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+
+    def _listen(self, sock):
+        while self.socket is sock:
+            try:
+                payload = sock.recv(2 ** 16)
+            except socket.error:
+                # raised once the socket is closed
+                if self.socket is sock:
+                    logger.exception('Failed to read from the bus socket.')
+                    sleep(RECONNECT_DELAY)
+            else:
+                self.receive(payload)
+
+    def _bind(self):
+        name = '{}-{}.sock'.format(os.getpid(), id(self))
+        self.path = os.path.join(self.directory, name)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(self.path)
+        thread = Thread(target=self._listen, args=(self.socket,))
+        thread.daemon = True
+        thread.start()
+
+    def subscribe(self, callback):
+        super(UnixSocketBus, self).subscribe(callback)
+
+        if not self.socket:
+            self._bind()
+
+    def after_fork(self):
+        # the inherited socket (and its path) belongs to the parent
+        sock, self.socket = self.socket, None
+
+        if sock:
+            sock.close()
+            self._bind()
+
+    def publish(self, message):
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        payloads = list(map(dumps, gen_batches(message)))
+
+        try:
+            for path in glob(os.path.join(self.directory, '*.sock')):
+                try:
+                    for payload in payloads:
+                        sender.sendto(payload, path)
+                except socket.error as ex:
+                    # remove sockets left behind by dead processes
+                    if ex.errno in {errno.ECONNREFUSED, errno.ENOENT}:
+                        os.remove(path)
+        finally:
+            sender.close()
+
+    def close(self):
+        super(UnixSocketBus, self).close()
+        sock, self.socket = self.socket, None
+
+        if sock:
+            sock.close()
+            os.remove(self.path)
+
+
+class RedisBus(Bus):
+    """A bus that uses redis pub/sub
+
+    Args:
+        client: A redis client or url.
+        channel (str): The channel to publish to.
+    """
+    def __init__(self, client, channel=DEF_CHANNEL):
+        super(RedisBus, self).__init__()
+
+        if isinstance(client, string_types):
+            client = from_url(client)
+
+        self.client = client
+        self.channel = channel
+        self.pubsub = None
+
+    def _listen(self, pubsub):
+        # After a connection error, `listen` reconnects and the pubsub
+        # resubscribes to its channel
+        while self.pubsub is pubsub:
+            try:
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.receive(message['data'])
+
+                # the pubsub was unsubscribed
+                return
+            except Exception:
+                # also raised once the bus is closed
+                if self.pubsub is pubsub:
+                    logger.warning(
+                        'Lost the bus connection, retrying.', exc_info=True)
+                    sleep(RECONNECT_DELAY)
+
+    def _connect(self):
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(self.channel)
+        thread = Thread(target=self._listen, args=(self.pubsub,))
+        thread.daemon = True
+        thread.start()
+
+    def subscribe(self, callback):
+        super(RedisBus, self).subscribe(callback)
+
+        if not self.pubsub:
+            self._connect()
+
+    def after_fork(self):
+        # the inherited connection belongs to the parent, so it is left open
+        if self.pubsub:
+            self._connect()
+
+    def publish(self, message):
+        for batch in gen_batches(message):
+            self.client.publish(self.channel, dumps(batch))
+
+    def close(self):
+        super(RedisBus, self).close()
+        pubsub, self.pubsub = self.pubsub, None
+
+        if pubsub:
+            pubsub.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.coalesce
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides in-process coalescing of concurrent calls with the same cache key,
+    so that only the first caller computes the result and the others wait for
+    it
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from threading import Event, Lock
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+class Flight(object):
+    """The result of an in-flight call"""
+    def __init__(self):
+        self.event = Event()
+        self.value = None
+        self.exception = None
+
+    def finish(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+        self.event.set()
+
+    def result(self):
+        self.event.wait()
+
+        if self.exception is not None:
+            raise self.exception
+
+        return self.value
+
+
+class Coalescer(object):
+    """Coalesces concurrent calls (from different threads) with the same key
+    into a single call. The lock is only taken on cache misses.
+    """
+    def __init__(self):
+        self.flights = {}
+        self.lock = Lock()
+
+    def call(self, key, func, *args, **kwargs):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            return flight.result()
+
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as exc:
+            # e.g., KeyboardInterrupt or a cancellation, which would otherwise
+            # leave the followers waiting forever
+            flight.finish(exception=exc)
+            raise
+        else:
+            flight.finish(value)
+            return value
+        finally:
+            with self.lock:
+                del self.flights[key]
+
+
+def is_coroutine_function(func):
+    return bool(asyncio) and asyncio.iscoroutinefunction(func)
+
+
+def get_running_loop():
+    """Returns the running event loop (Python 3.7+ only raises outside of
+    one)"""
+    getter = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+    return getter()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.policies
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides timeout policies for memoized functions
+
+    A policy is a callable that accepts a result and the number of seconds it
+    took to compute, and returns the timeout to cache the result with.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+
+class AdaptiveTimeout(object):
+    """A timeout proportional to the time it took to compute the result, so
+    the results that save the most work stay cached the longest.
+
+    Args:
+        min_timeout (int): The timeout of results that were cheap to compute.
+        max_timeout (int): The timeout of results that were expensive to
+            compute.
+        factor (int): The number of seconds to cache a result for each second
+            it took to compute.
+
+    Example:
+        >>> timeout = AdaptiveTimeout(60, 3600, factor=100)
+        >>> timeout('cheap', 0.01)
+        60
+        >>> timeout('costly', 5)
+        500
+        >>> timeout('slow', 100)
+        3600
+    """
+    def __init__(self, min_timeout=60, max_timeout=3600, factor=1000):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.factor = factor
+
+    def __call__(self, result, duration):
+        timeout = int(duration * self.factor)
+        return max(self.min_timeout, min(timeout, self.max_timeout))
+
+
+def get_timeout(timeout, result, duration=0):
+    """Returns the timeout for a result, calling `timeout` if it is a policy"""
+    return timeout(result, duration) if callable(timeout) else timeout
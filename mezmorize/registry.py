@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.registry
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides key registries used to reclaim the entries orphaned by a version
+    reset
+
+    A registry maps each version hash (a "generation") to the cache keys that
+    were memoized under it, so once a version hash is swapped out, its keys can
+    be bulk deleted instead of lingering in the backend until they time out.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from time import time
+
+from .utils import decode
+
+DEF_REGISTRY_THRESHOLD = 10000
+
+# Adds a key to a generation's set, and only ever extends the set's ttl (to
+# that of its longest lived key). A timeout of 0 never expires.
+REDIS_ADD_SCRIPT = """
+local created = redis.call('exists', KEYS[1]) == 0
+local timeout = tonumber(ARGV[2])
+redis.call('sadd', KEYS[1], ARGV[1])
+
+if timeout == 0 then
+    redis.call('persist', KEYS[1])
+else
+    local ttl = redis.call('ttl', KEYS[1])
+
+    if created or (ttl >= 0 and ttl < timeout) then
+        redis.call('expire', KEYS[1], timeout)
+    end
+end
+"""
+
+
+class LocalRegistry(object):
+    """An in-process registry. Suitable for the `simple` and `filesystem`
+    backends, or whenever a single process does all the memoizing.
+
+    Keys are forgotten once they time out. Beyond `threshold` entries, the
+    oldest ones are forgotten too (their keys are then left to time out in the
+    backend instead of being reclaimed).
+
+    Args:
+        default_timeout (int): The backend's timeout of keys added without
+            one (0 never expires).
+        threshold (int): The max number of (generation, key) entries.
+    """
+    def __init__(self, default_timeout=0, threshold=DEF_REGISTRY_THRESHOLD):
+        self.default_timeout = default_timeout
+        self.threshold = threshold
+        self.generations = defaultdict(set)
+        self.expiries = OrderedDict()
+        self.lock = Lock()
+
+    def _forget(self, generation, key):
+        del self.expiries[(generation, key)]
+        keys = self.generations[generation]
+        keys.discard(key)
+
+        if not keys:
+            del self.generations[generation]
+
+    def _prune(self):
+        # Called once the threshold is exceeded, and frees a quarter of it so
+        # that pruning stays rare
+        now = time()
+        live = []
+
+        for entry, expires in list(self.expiries.items()):
+            if expires and expires <= now:
+                self._forget(*entry)
+            else:
+                live.append(entry)
+
+        # the oldest entries come first
+        excess = max(len(live) - self.threshold * 3 // 4, 0)
+
+        for entry in live[:excess]:
+            self._forget(*entry)
+
+    def add(self, generations, key, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+
+        expires = time() + timeout if timeout else 0
+
+        with self.lock:
+            for generation in generations:
+                # re-added entries move to the end
+                self.expiries.pop((generation, key), None)
+                self.expiries[(generation, key)] = expires
+                self.generations[generation].add(key)
+
+            if len(self.expiries) > self.threshold:
+                self._prune()
+
+    def pop(self, generation):
+        with self.lock:
+            keys = self.generations.pop(generation, set())
+
+            for key in keys:
+                del self.expiries[(generation, key)]
+
+        return keys
+
+
+class RedisRegistry(object):
+    """A registry that stores each generation as a redis set, so it is shared
+    by every process using the same redis server.
+
+    Args:
+        client: A redis client.
+        prefix (str): The prefix of the set names.
+        default_timeout (int): The backend's timeout of keys added without
+            one (0 never expires).
+    """
+    def __init__(self, client, prefix='mezmorize-registry:', default_timeout=0):
+        self.client = client
+        self.prefix = prefix
+        self.default_timeout = default_timeout
+        self.add_script = client.register_script(REDIS_ADD_SCRIPT)
+
+    def add(self, generations, key, timeout=None):
+        pipe = self.client.pipeline(transaction=False)
+
+        if timeout is None:
+            timeout = self.default_timeout
+
+        # a set never needs to outlive the keys it holds, but mustn't expire
+        # before any of them either
+        for generation in generations:
+            name = self.prefix + generation
+            self.add_script(keys=[name], args=[key, timeout], client=pipe)
+
+        pipe.execute()
+
+    def pop(self, generation):
+        name = self.prefix + generation
+        pipe = self.client.pipeline()
+        pipe.smembers(name)
+        pipe.delete(name)
+        return set(map(decode, pipe.execute()[0]))
+
+
+def get_registry(cache):
+    """Returns the default registry for a backend"""
+    client = getattr(cache, '_client', None)
+    default_timeout = getattr(cache, 'default_timeout', 0)
+
+    if client and hasattr(client, 'smembers'):
+        # kept out of the key space of the cache (see `RedisCache.iter_items`)
+        prefix = 'mezmorize-registry:' + (cache.key_prefix or '')
+        registry = RedisRegistry(client, prefix, default_timeout)
+    else:
+        registry = LocalRegistry(default_timeout)
+
+    return registry
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.scope
+    ~~~~~~~~~~~~~~~
+
+    Provides request scopes, i.e., dicts of the values fetched during a single
+    (web) request, so repeated lookups of the same key skip the backend
+
+    Scopes are stored in a context variable, so each thread and asyncio task
+    sees the scope of the request it serves (tasks share the scope they were
+    created in). Without the `contextvars` module, they are thread local.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from threading import local
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+
+class ScopeVar(object):
+    """Holds the current scope (or None)"""
+    def __init__(self, name):
+        if ContextVar:
+            self.var = ContextVar(name, default=None)
+        else:
+            self.var = None
+            self.local = local()
+
+    def get(self):
+        if self.var:
+            scope = self.var.get()
+        else:
+            scope = getattr(self.local, 'scope', None)
+
+        return scope
+
+    def enter(self):
+        """Starts a new scope and returns the token to `exit` it with"""
+        if self.var:
+            token = self.var.set({})
+        else:
+            token = self.get()
+            self.local.scope = {}
+
+        return token
+
+    def exit(self, token):
+        """Discards the current scope and restores the previous one"""
+        if self.var:
+            self.var.reset(token)
+        else:
+            self.local.scope = token
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.snapshot
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides a streaming format for dumping and restoring cache contents
+
+    A snapshot starts with a 6 byte header (magic, version, flags) followed by
+    a stream of records, optionally zlib compressed. Each record is
+
+        key_type (1 byte), expires (8 bytes), key_len (4), value_len (4),
+        key (key_len bytes), pickled value (value_len bytes)
+
+    where `expires` is an absolute timestamp, or 0 if the item never expires.
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import zlib
+import struct
+
+from .utils import ENCODING
+
+MAGIC = b'MZSN'
+VERSION = 1
+COMPRESSED = 1
+HASHED_KEYS = 2
+CHUNKSIZE = 2 ** 16
+
+HEADER = struct.Struct('>4sBB')
+RECORD = struct.Struct('>BdII')
+
+
+class Reader(object):
+    """A file-like wrapper that transparently decompresses a snapshot stream
+    """
+    def __init__(self, fp, compressed=False):
+        self.fp = fp
+        self.decompressor = zlib.decompressobj() if compressed else None
+        self.buffer = bytearray()
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            chunk = self.fp.read(CHUNKSIZE)
+
+            if not chunk:
+                break
+            elif self.decompressor:
+                chunk = self.decompressor.decompress(chunk)
+
+            self.buffer.extend(chunk)
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def write_snapshot(fp, items, compress=True, hashed_keys=False):
+    """Writes `(key, expires, pickled)` items to a binary file object
+
+    Returns:
+        int: the number of items written
+    """
+    flags = COMPRESSED if compress else 0
+    flags |= HASHED_KEYS if hashed_keys else 0
+    compressor = zlib.compressobj() if compress else None
+    write = fp.write
+    fp.write(HEADER.pack(MAGIC, VERSION, flags))
+    count = 0
+
+    for count, (key, expires, pickled) in enumerate(items, 1):
+        is_bytes = isinstance(key, bytes)
+        bkey = key if is_bytes else key.encode(ENCODING)
+        record = RECORD.pack(is_bytes, expires, len(bkey), len(pickled))
+        data = record + bkey + pickled
+        write(compressor.compress(data) if compressor else data)
+
+    if compressor:
+        write(compressor.flush())
+
+    return count
+
+
+def read_header(fp):
+    """Reads the snapshot header from a binary file object
+
+    Returns:
+        Tuple(Reader, bool): the record reader and whether the keys are hashed
+    """
+    magic, version, flags = HEADER.unpack(fp.read(HEADER.size))
+
+    if magic != MAGIC:
+        raise ValueError('Not a mezmorize snapshot.')
+    elif version > VERSION:
+        raise ValueError('Unsupported snapshot version {}.'.format(version))
+
+    reader = Reader(fp, compressed=flags & COMPRESSED)
+    return reader, bool(flags & HASHED_KEYS)
+
+
+def gen_items(reader):
+    """Yields `(key, expires, pickled)` items from a snapshot Reader"""
+    while True:
+        record = reader.read(RECORD.size)
+
+        if not record:
+            break
+        elif len(record) < RECORD.size:
+            raise ValueError('Truncated snapshot.')
+
+        is_bytes, expires, key_len, value_len = RECORD.unpack(record)
+        bkey = reader.read(key_len)
+        value = reader.read(value_len)
+
+        if len(bkey) < key_len or len(value) < value_len:
+            raise ValueError('Truncated snapshot.')
+
+        key = bkey if is_bytes else bkey.decode(ENCODING)
+        yield key, expires, value
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    mezmorize.stats
+    ~~~~~~~~~~~~~~~
+
+    Provides cache instrumentation
+"""
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import socket
+
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import partial, wraps
+from threading import Lock
+from timeit import default_timer as timer
+
+COUNTERS = ('hits', 'misses', 'sets', 'errors', 'version_fetches')
+
+# The phases of a memoized call. 'key' is used instead of 'version', 'bind' and
+# 'hash' when the function has a custom `make_cache_key`, and 'wait' instead of
+# 'call' and 'set' when a coalesced call waits for another caller's result.
+PHASES = ('version', 'bind', 'hash', 'key', 'get', 'wait', 'call', 'set')
+
+# Upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {
+            'buckets': dict(zip(self.buckets, self.counts)),
+            'count': self.count, 'sum': self.sum}
+
+
+class Stats(object):
+    """Collects counters and latency histograms for a Cache or a memoized
+    function, and forwards each measurement to its parent (if any) and to the
+    registered listeners.
+
+    Listeners are callables with the signature
+    `listener(metric_type, metric, value, name)` where `metric_type` is either
+    'counter' or 'timer', and `name` is the memoized function's namespace (or
+    None for Cache level operations).
+    """
+    def __init__(self, name=None, parent=None, listeners=None):
+        self.name = name
+        self.parent = parent
+        self.listeners = list(listeners or [])
+        self.children = {}
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {}
+
+        for child in self.children.values():
+            child.reset()
+
+    def child(self, name):
+        return self.children.setdefault(name, Stats(name, parent=self))
+
+    def notify(self, metric_type, metric, value, name):
+        if self.parent:
+            self.parent.record(metric_type, metric, value, name)
+
+        for listener in self.listeners:
+            listener(metric_type, metric, value, name)
+
+    def record(self, metric_type, metric, value, name=None):
+        with self.lock:
+            if metric_type == 'counter':
+                self.counters[metric] = self.counters.get(metric, 0) + value
+            else:
+                histogram = self.histograms.get(metric)
+
+                if histogram is None:
+                    histogram = self.histograms[metric] = Histogram()
+
+                histogram.observe(value)
+
+        self.notify(metric_type, metric, value, name or self.name)
+
+    def incr(self, counter, value=1):
+        self.record('counter', counter, value)
+
+    def observe(self, operation, seconds):
+        self.record('timer', operation, seconds)
+
+    def call(self, operation, func, *args, **kwargs):
+        """Calls `func` and records its latency (and any error) as
+        `operation`"""
+        start = timer()
+
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            self.incr('errors')
+            raise
+        finally:
+            self.observe(operation, timer() - start)
+
+    def as_dict(self):
+        with self.lock:
+            stats = dict(self.counters)
+            histograms = dict(self.histograms)
+
+        compute = histograms.get('compute')
+        stats['compute_seconds'] = compute.sum if compute else 0
+        stats['latency'] = {k: v.as_dict() for k, v in histograms.items()}
+        return stats
+
+    def gen_prometheus(self, prefix, labels=''):
+        counters = self.as_dict()
+
+        for counter in COUNTERS:
+            yield '{}_{}_total{} {}'.format(
+                prefix, counter, labels and '{%s}' % labels, counters[counter])
+
+        for operation, histogram in sorted(self.histograms.items()):
+            op_label = 'operation="{}"'.format(operation)
+            _labels = ','.join(label for label in (labels, op_label) if label)
+            cumulative = 0
+
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = '+Inf' if bucket == float('inf') else repr(bucket)
+                yield '{}_latency_seconds_bucket{{{},le="{}"}} {}'.format(
+                    prefix, _labels, le, cumulative)
+
+            yield '{}_latency_seconds_sum{{{}}} {}'.format(
+                prefix, _labels, histogram.sum)
+
+            yield '{}_latency_seconds_count{{{}}} {}'.format(
+                prefix, _labels, histogram.count)
+
+    def prometheus(self, prefix='mezmorize'):
+        """Renders these stats and those of every memoized function in the
+        Prometheus text exposition format"""
+        lines = list(self.gen_prometheus(prefix))
+
+        for name, child in sorted(self.children.items()):
+            labels = 'function="{}"'.format(name)
+            lines.extend(child.gen_prometheus(prefix, labels))
+
+        return '\n'.join(lines) + '\n'
+
+
+class Laps(object):
+    """Records the time elapsed between consecutive calls"""
+    def __init__(self):
+        self.timings = []
+        self.last = timer()
+
+    def __call__(self, phase):
+        now = timer()
+        self.timings.append((phase, now - self.last))
+        self.last = now
+
+
+class Profile(object):
+    """Aggregates the time spent in each phase of a memoized function's calls
+
+    Example:
+        >>> profile = Profile('add')
+        >>> profile.add([('get', 0.0002), ('call', 0.001)], hit=False)
+        >>> profile.add([('get', 0.0001)], hit=True)
+        >>> print(profile.folded())
+        add;get 300
+        add;call 1000
+    """
+    def __init__(self, name):
+        self.name = name
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.hits = 0
+        self.totals = OrderedDict((phase, 0) for phase in PHASES)
+
+    def add(self, timings, hit=False):
+        with self.lock:
+            self.calls += 1
+            self.hits += hit
+
+            for phase, seconds in timings:
+                self.totals[phase] += seconds
+
+    def as_dict(self):
+        with self.lock:
+            totals = OrderedDict((k, v) for k, v in self.totals.items() if v)
+
+        return {'calls': self.calls, 'hits': self.hits, 'totals': totals}
+
+    def table(self):
+        """Renders the per phase totals as a text table"""
+        profile = self.as_dict()
+        total = sum(profile['totals'].values()) or 1
+        calls = profile['calls'] or 1
+        header = '{} ({} calls, {} hits)'.format(
+            self.name, profile['calls'], profile['hits'])
+
+        lines = [
+            header,
+            '{:<8} {:>12} {:>14} {:>7}'.format(
+                'phase', 'total (ms)', 'per call (us)', 'share')]
+
+        for phase, seconds in profile['totals'].items():
+            lines.append('{:<8} {:>12.3f} {:>14.2f} {:>6.1f}%'.format(
+                phase, seconds * 1000, seconds * 10 ** 6 / calls,
+                seconds * 100 / total))
+
+        return '\n'.join(lines)
+
+    def folded(self):
+        """Renders the per phase totals (in microseconds) in the folded stack
+        format used by flamegraph.pl and speedscope"""
+        totals = self.as_dict()['totals'].items()
+        lines = (
+            '{};{} {}'.format(self.name, phase, int(round(seconds * 10 ** 6)))
+            for phase, seconds in totals)
+
+        return '\n'.join(lines)
+
+
+class StatsdListener(object):
+    """A listener that sends measurements to a StatsD server over UDP
+
+    Example:
+        >>> from mezmorize import Cache
+        >>>
+        >>> listener = StatsdListener(prefix='myapp.cache')
+        >>> cache = Cache(CACHE_STATS_LISTENERS=[listener])
+    """
+    def __init__(self, host='localhost', port=8125, prefix='mezmorize'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, metric_type, metric, value, name=None):
+        stat = '.'.join(n for n in (self.prefix, name, metric) if n)
+
+        if metric_type == 'timer':
+            line = '{}:{:.3f}|ms'.format(stat, value * 1000)
+        else:
+            line = '{}:{}|c'.format(stat, value)
+
+        try:
+            self.socket.sendto(line.encode('utf-8'), self.address)
+        except socket.error:
+            pass
+
+
+def instrument(stats, operation, func):
+    """Returns a version of `func` that records its latency if `stats` is
+    enabled"""
+    return partial(stats.call, operation, func) if stats else func
+
+
+def timed(operation):
+    """Decorates a Cache method so that its latency is recorded in the
+    Cache's stats (if enabled)"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.stats:
+                return self.stats.call(operation, method, self, *args, **kwargs)
+            else:
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
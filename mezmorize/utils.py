@@ -13,6 +13,13 @@ from __future__ import (
 from os import getenv, path
 from subprocess import call
 from copy import copy
+from importlib import import_module
+from timeit import default_timer as timer
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = ProcessPoolExecutor = None
 
 try:
     import pylibmc
@@ -40,6 +47,11 @@ DEF_DEFAULT_TIMEOUT = 300
 DEF_MC_HOST = DEF_REDIS_HOST = 'localhost'
 DEF_MC_PORT = 11211
 DEF_REDIS_PORT = 6379
+
+# Seconds a socket read or write (of the memcached and redis clients) may block
+# before it fails, so a hung server doesn't hang the callers
+DEF_SOCKET_TIMEOUT = 1
+
 ENCODING = 'utf-8'
 
 ALL_MEMCACHES = (
@@ -58,6 +70,7 @@ REDIS_URL = getenv('REDIS_URL') or getenv('REDISTOGO_URL') or DEF_REDIS_URL
 
 CACHE_CONFIGS = {
     'simple': {'CACHE_TYPE': 'simple'},
+    'striped': {'CACHE_TYPE': 'striped'},
     'null': {'CACHE_TYPE': 'null'},
     'redis': {'CACHE_TYPE': 'redis', 'CACHE_REDIS_URL': REDIS_URL},
     'filesystem': {
@@ -119,6 +132,8 @@ def get_cache_type(cache=None, spread=False, **kwargs):
             cache_type = 'memcached'
     elif HAS_REDIS and cache == 'redis':
         cache_type = 'redis'
+    elif cache == 'striped':
+        cache_type = 'striped'
     elif cache_dir and cache not in {'simple', 'null'}:
         cache_type = 'filesystem'
     elif cache != 'null':
@@ -143,7 +158,8 @@ def get_cache_config(cache_type, db=None, **kwargs):
     return config
 
 
-def get_pylibmc_client(servers, timeout=None, binary=True, **kwargs):
+def get_pylibmc_client(servers, timeout=None, binary=True,
+                       socket_timeout=DEF_SOCKET_TIMEOUT, **kwargs):
     from pylibmc import Client
 
     try:
@@ -152,15 +168,23 @@ def get_pylibmc_client(servers, timeout=None, binary=True, **kwargs):
         from pylibmc import Error, ServerError
         TooBig = (Error, ServerError)
 
+    behaviors = kwargs.setdefault('behaviors', {})
+
     if timeout:
-        kwargs['behaviors'] = {'connect_timeout': timeout}
+        behaviors['connect_timeout'] = timeout
+
+    if socket_timeout:
+        # in microseconds
+        behaviors.setdefault('send_timeout', int(socket_timeout * 10 ** 6))
+        behaviors.setdefault('receive_timeout', int(socket_timeout * 10 ** 6))
 
     client = Client(servers, binary=binary, **kwargs)
     client.TooBig = TooBig
     return client
 
 
-def get_pymemcache_client(servers, timeout=None, **kwargs):
+def get_pymemcache_client(servers, timeout=None,
+                          socket_timeout=DEF_SOCKET_TIMEOUT, **kwargs):
     from pymemcache.client.hash import HashClient
 
     from pymemcache.serde import (
@@ -170,7 +194,10 @@ def get_pymemcache_client(servers, timeout=None, **kwargs):
     kwargs.setdefault('deserializer', python_memcache_deserializer)
 
     if timeout:
-        kwargs['timeout'] = timeout
+        kwargs['connect_timeout'] = timeout
+
+    if socket_timeout:
+        kwargs.setdefault('timeout', socket_timeout)
 
     split = [s.split(':') for s in servers]
     _servers = [(host, int(port)) for host, port in split]
@@ -185,11 +212,13 @@ def get_pymemcache_client(servers, timeout=None, **kwargs):
     return client
 
 
-def get_bmemcached_client(servers, timeout=None, **kwargs):
+def get_bmemcached_client(servers, timeout=None,
+                          socket_timeout=DEF_SOCKET_TIMEOUT, **kwargs):
     from bmemcached import Client
 
-    if timeout:
-        kwargs['socket_timeout'] = timeout
+    # bmemcached has a single timeout for connecting, reading and writing
+    if timeout or socket_timeout:
+        kwargs['socket_timeout'] = max(timeout or 0, socket_timeout or 0)
 
     client = Client(servers, **kwargs)
     client.TooBig = None
@@ -197,9 +226,65 @@ def get_bmemcached_client(servers, timeout=None, **kwargs):
 
 
 def decode(word):
-    try:
-        decoded = word.decode(ENCODING)
-    except AttributeError:
-        decoded = word
+    # checking the type is much cheaper than catching an AttributeError
+    return word.decode(ENCODING) if isinstance(word, bytes) else word
+
+
+def import_object(name):
+    """Imports an object given as 'package.module:attr' (or
+    'package.module.attr')
+    """
+    if ':' in name:
+        module_name, attrs = name.split(':', 1)
+    else:
+        module_name, _, attrs = name.rpartition('.')
+
+    obj = import_module(module_name)
+
+    for attr in attrs.split('.'):
+        obj = getattr(obj, attr)
+
+    return obj
+
+
+def gen_call_args(arguments):
+    """Yields (args, kwargs) pairs from an iterable of function arguments.
+
+    Each item may be a tuple (or list) of positional arguments, a dict of
+    keyword arguments, or a single positional argument.
+    """
+    for item in arguments:
+        if isinstance(item, dict):
+            yield (), item
+        elif isinstance(item, (tuple, list)):
+            yield tuple(item), {}
+        else:
+            yield (item,), {}
+
+
+def call_uncached(name, args, kwargs):
+    """Calls the original (undecorated) function of the memoized function
+    found at `name`. Used to compute results in a separate process.
+    """
+    func = import_object(name)
+
+    # `name` refers to the original function if it wasn't memoized in place
+    return getattr(func, 'uncached', func)(*args, **kwargs)
+
+
+def time_call(func, *args, **kwargs):
+    """Calls `func` and returns a tuple of its result and the number of
+    seconds it took
+    """
+    start = timer()
+    result = func(*args, **kwargs)
+    return result, timer() - start
+
+
+def get_executor(concurrency=1, processes=False):
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    if not executor_cls:
+        raise RuntimeError('No concurrent.futures module found.')
 
-    return decoded
+    return executor_cls(max_workers=concurrency)
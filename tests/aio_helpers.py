@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# vim: sw=4:ts=4:expandtab
+"""
+    tests.aio_helpers
+    ~~~~~~~~~~~~~~~~~
+
+    Provides coroutine functions for the asyncio tests, and functions with
+    keyword-only arguments (kept out of test_cache.py since the syntax is
+    Python 3.5+ only).
+"""
+import asyncio
+import random
+
+
+def get_fetch(cache, calls, **kwargs):
+    @cache.memoize(**kwargs)
+    async def fetch(a):
+        calls.append(a)
+        await asyncio.sleep(0.1)
+
+        if a == 'missing':
+            raise KeyError(a)
+
+        return a + str(random.random())
+
+    return fetch
+
+
+def get_scale(cache, calls, **kwargs):
+    @cache.memoize(**kwargs)
+    def scale(a, *, factor=2, conn=None):
+        calls.append(conn)
+        return a * factor + random.random()
+
+    return scale
+
+
+async def gather(func, *args):
+    return await asyncio.gather(*map(func, args), return_exceptions=True)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -9,22 +9,80 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals)
 
+import os
+import socket
 import time
+import inspect
 import random
 
+from io import BytesIO
+from functools import partial
+from threading import Event, Thread
+from tempfile import mkdtemp
+
 import nose.tools as nt
 
-from mezmorize import Cache, function_namespace
+from six import PY3
+
+from mezmorize import Cache, ContentRef, Negative, function_namespace
+from mezmorize.breaker import BackendUnavailable
+from mezmorize.bus import LocalBus, RedisBus, UnixSocketBus, dumps
+from mezmorize.coalesce import Coalescer
+from mezmorize.policies import AdaptiveTimeout
+from mezmorize.registry import LocalRegistry, RedisRegistry
 from mezmorize.utils import HAS_MEMCACHE, HAS_REDIS, get_cache_config
 
 from mezmorize.backends import (
     SimpleCache, FileSystemCache, RedisCache, MemcachedCache,
-    SASLMemcachedCache, SpreadSASLMemcachedCache, AVAIL_MEMCACHES)
+    SASLMemcachedCache, SpreadSASLMemcachedCache, LRUCache, GDSFCache,
+    StripedCache, ReplicatedCache, AVAIL_MEMCACHES)
 
 BIGINT = 2 ** 21
 BIGGERINT = 2 ** 28
 
 
+def square(a):
+    return a * a
+
+
+class ClientCache(SimpleCache):
+    """A SimpleCache with a (stand-in) client, like the remote backends"""
+    def __init__(self, *args, **kwargs):
+        super(ClientCache, self).__init__(*args, **kwargs)
+        self._client = object()
+        self.down = False
+        self.delay = 0
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        time.sleep(self.delay)
+
+        if self.down:
+            raise IOError('Connection refused')
+
+        return super(ClientCache, self).get(key)
+
+    def set(self, *args, **kwargs):
+        self.calls += 1
+
+        if self.down:
+            raise IOError('Connection refused')
+
+        return super(ClientCache, self).set(*args, **kwargs)
+
+
+class HTTPError(Exception):
+    """An exception that can be pickled, but not unpickled"""
+    def __init__(self, code, msg):
+        super(HTTPError, self).__init__(msg)
+        self.code = code
+
+
+def client_cache(config, *args, **kwargs):
+    return ClientCache(*args, **kwargs)
+
+
 def setup_func(*args, **kwargs):
     namespace = kwargs.pop('namespace', None)
     client_name = kwargs.pop('client_name', None)
@@ -261,6 +319,26 @@ class TestCache(object):
         with nt.assert_raises(TypeError):
             func(1)
 
+    def test_ignore_key_args(self):
+        calls = []
+        fingerprint = lambda rows: sum(rows)
+
+        @self.cache.memoize(ignore=('conn',), key_args={'rows': fingerprint})
+        def func(conn, rows, scale=1):
+            calls.append(conn)
+            return sum(rows) * scale
+
+        nt.assert_equal(func('conn1', [1, 2, 3]), 6)
+        nt.assert_equal(func('conn2', [3, 2, 1]), 6)
+        nt.assert_equal(func('conn3', rows=[6], scale=1), 6)
+        nt.assert_equal(calls, ['conn1'])
+
+        nt.assert_equal(func('conn4', [1, 2, 3], 2), 12)
+        nt.assert_equal(calls, ['conn1', 'conn4'])
+
+        with nt.assert_raises(ValueError):
+            self.cache.memoize(ignore=('connection',))(func.uncached)
+
     def test_classarg(self):
         @self.cache.memoize()
         def func(a):
@@ -336,6 +414,53 @@ class TestCache(object):
         nt.assert_not_equal(a3, a5)
         nt.assert_not_equal(a4, a6)
 
+    def test_cache_key_protocol(self):
+        class User(object):
+            def __init__(self, id):
+                self.id = id
+
+            def __cache_key__(self):
+                return 'User:{}'.format(self.id)
+
+            @self.cache.memoize()
+            def score(self):
+                return self.id + random.random()
+
+            @self.cache.memoize(key_self=lambda user: -user.id)
+            def rank(self):
+                return self.id + random.random()
+
+        # equal identities share results, even for different instances
+        user1, user2, user3 = User(1), User(1), User(2)
+        result = user1.score()
+        nt.assert_equal(user2.score(), result)
+        nt.assert_not_equal(user3.score(), result)
+
+        make_cache_key = partial(User.score.make_cache_key, User.score.uncached)
+        nt.assert_equal(make_cache_key(user1), make_cache_key(user2))
+
+        result = user1.rank()
+        nt.assert_equal(user2.rank(), result)
+        nt.assert_not_equal(user3.rank(), result)
+
+        self.cache.delete_memoized(user2.rank)
+        nt.assert_not_equal(user1.rank(), result)
+
+    def test_key_self_classmethod(self):
+        class User(object):
+            @classmethod
+            @self.cache.memoize(key_self=lambda user: user.id)
+            def count(cls, a):
+                return a + random.random()
+
+        # the class isn't passed to `key_self`
+        result = User.count(1)
+        nt.assert_equal(User.count(1), result)
+        nt.assert_not_equal(User.count(2), result)
+
+        self.cache.delete_memoized(User.count)
+        nt.assert_not_equal(User.count(1), result)
+
     def test_delete_classmethod(self):
         class Mock(object):
             @classmethod
@@ -423,6 +548,499 @@ class TestCache(object):
         args = self.cache._gen_args(func, 1, 2, d='bar', c='foo')
         nt.assert_equal(tuple(args), expected)
 
+    def test_tags(self):
+        tags = lambda a, b: ['a.{}'.format(a), 'b.{}'.format(b)]
+
+        @self.cache.memoize(tags=tags)
+        def func(a, b):
+            return a + b + random.random()
+
+        result_a = func(1, 2)
+        result_b = func(1, 3)
+        result_c = func(2, 3)
+        nt.assert_equal(func(1, 2), result_a)
+
+        self.cache.invalidate_tags('a.1')
+        nt.assert_not_equal(func(1, 2), result_a)
+        nt.assert_not_equal(func(1, 3), result_b)
+        nt.assert_equal(func(2, 3), result_c)
+
+        result_b = func(1, 3)
+        self.cache.invalidate_tags('b.3', 'unused')
+        nt.assert_not_equal(func(1, 3), result_b)
+        nt.assert_not_equal(func(2, 3), result_c)
+
+        result_a = func(1, 2)
+        self.cache.delete_memoized(func, 1, 2)
+        nt.assert_not_equal(func(1, 2), result_a)
+
+    def test_mixed_tags(self):
+        @self.cache.memoize(tags=lambda a: [a, 'user', None])
+        def func(a):
+            return random.random()
+
+        result = func(1)
+        nt.assert_equal(func(1), result)
+
+        self.cache.invalidate_tags(1)
+        nt.assert_not_equal(func(1), result)
+
+    def test_negative(self):
+        calls = []
+        is_negative = lambda result: result is None
+
+        @self.cache.memoize(
+            cache_exceptions=KeyError, is_negative=is_negative,
+            negative_timeout=1)
+        def func(a):
+            calls.append(a)
+
+            if a in {'missing', 'invalid'}:
+                raise {'missing': KeyError, 'invalid': ValueError}[a](a)
+
+            return None if a == 'none' else a
+
+        for _ in range(2):
+            nt.assert_raises(KeyError, func, 'missing')
+            nt.assert_raises(ValueError, func, 'invalid')
+            nt.assert_is_none(func('none'))
+            nt.assert_equal(func('a'), 'a')
+
+        nt.assert_equal(calls, ['missing', 'invalid', 'none', 'a', 'invalid'])
+
+        time.sleep(1.5)
+        nt.assert_is_none(func('none'))
+        nt.assert_equal(func('a'), 'a')
+        nt.assert_equal(calls[-1], 'none')
+
+    def test_negative_unpicklable(self):
+        calls = []
+
+        @self.cache.memoize(cache_exceptions=HTTPError)
+        def func(a):
+            calls.append(a)
+            raise HTTPError(500, 'Server error')
+
+        for _ in range(2):
+            nt.assert_raises(HTTPError, func, 1)
+
+        nt.assert_equal(calls, [1, 1])
+
+        # entries that can't be unpickled are misses
+        cache_key = func.make_cache_key(func.uncached, 1)
+        self.cache.set(cache_key, Negative(exception=HTTPError(500, 'Error')))
+        nt.assert_raises(HTTPError, func, 1)
+        nt.assert_equal(calls, [1, 1, 1])
+
+    def test_dynamic_timeout(self):
+        calls = []
+        timeouts = []
+
+        def timeout(result, duration):
+            timeouts.append((result, duration))
+            return 1 if result == 'cheap' else 60
+
+        @self.cache.memoize(timeout=timeout)
+        def func(a):
+            calls.append(a)
+            time.sleep(0.1 if a == 'costly' else 0)
+            return a
+
+        func('cheap')
+        func('costly')
+        nt.assert_equal([t[0] for t in timeouts], ['cheap', 'costly'])
+        nt.assert_greater_equal(timeouts[1][1], 0.1)
+
+        nt.assert_equal(self.cache.warm(func, ['warmed']), 1)
+        nt.assert_equal(timeouts[-1][0], 'warmed')
+
+        time.sleep(1.5)
+        func('cheap')
+        func('costly')
+        func('warmed')
+        nt.assert_equal(calls, ['cheap', 'costly', 'warmed', 'cheap'])
+
+    def test_adaptive_timeout(self):
+        timeout = AdaptiveTimeout(1, 60, factor=100)
+
+        @self.cache.memoize(timeout=timeout)
+        def func(a):
+            time.sleep(a)
+            return a + random.random()
+
+        cheap = func(0)
+        costly = func(0.05)
+        time.sleep(1.5)
+        nt.assert_not_equal(func(0), cheap)
+        nt.assert_equal(func(0.05), costly)
+
+    def test_coalesce(self):
+        calls = []
+        results = []
+
+        @self.cache.memoize(coalesce=True)
+        def func(a):
+            calls.append(a)
+            time.sleep(0.1)
+            return a + random.random()
+
+        # create the version hash beforehand
+        func.make_cache_key(func.uncached, 1)
+        target = lambda: results.append(func(1))
+        threads = [Thread(target=target) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        nt.assert_equal(calls, [1])
+        nt.assert_equal(len(set(results)), 1)
+        nt.assert_equal(func(1), results[0])
+
+    def test_coalesce_cancelled(self):
+        coalescer = Coalescer()
+        started, results = Event(), []
+
+        class Cancelled(BaseException):
+            pass
+
+        def cancelled():
+            started.set()
+            time.sleep(0.1)
+            raise Cancelled()
+
+        def lead():
+            try:
+                coalescer.call('key', cancelled)
+            except Cancelled:
+                pass
+
+        def follow():
+            try:
+                results.append(coalescer.call('key', int))
+            except Cancelled as exc:
+                results.append(exc)
+
+        leader = Thread(target=lead)
+        leader.start()
+        started.wait()
+        follower = Thread(target=follow)
+        follower.daemon = True
+        follower.start()
+        leader.join()
+        follower.join(1)
+
+        # the follower gets the leader's exception instead of hanging
+        nt.assert_false(follower.is_alive())
+        nt.assert_is_instance(results[0], Cancelled)
+        nt.assert_equal(coalescer.flights, {})
+
+    def test_generator(self):
+        calls = []
+
+        @self.cache.memoize()
+        def gen(n):
+            calls.append(n)
+
+            for i in range(n):
+                yield i * 2
+
+        gen.page_size = 3
+        gen.page_window = 2
+        items = list(gen(10))
+        nt.assert_equal(items, list(range(0, 20, 2)))
+        nt.assert_equal(list(gen(10)), items)
+        nt.assert_equal(calls, [10])
+
+        # a partially consumed result isn't cached
+        stream = gen(5)
+        next(stream)
+        stream.close()
+        nt.assert_equal(list(gen(5)), [0, 2, 4, 6, 8])
+        nt.assert_equal(calls, [10, 5, 5])
+
+        # a missing page is recomputed
+        cache_key = gen.make_cache_key(gen.uncached, 10)
+        self.cache.delete('{}.2'.format(cache_key))
+        nt.assert_equal(list(gen(10)), items)
+        nt.assert_equal(calls, [10, 5, 5, 10])
+
+    def test_key_registry(self):
+        config = dict(self.cache.config, CACHE_KEY_REGISTRY=True)
+        cache = Cache(**config)
+
+        @cache.memoize(tags=lambda a: ['a.{}'.format(a)])
+        def func(a):
+            return a + random.random()
+
+        keys = [func.make_cache_key(func.uncached, a) for a in range(3)]
+        results = list(map(func, range(3)))
+        nt.assert_equal(cache.cache.get_many(*keys), results)
+
+        cache.invalidate_tags('a.0')
+        cache.reclaimer.join()
+        nt.assert_equal(cache.cache.get_many(*keys), [None] + results[1:])
+
+        cache.delete_memoized(func)
+        cache.reclaimer.join()
+        nt.assert_equal(cache.cache.get_many(*keys), [None, None, None])
+
+        key = func.make_cache_key(func.uncached, 1)
+        result = func(1)
+        cache.delete_memoized_verhash(func)
+        cache.reclaimer.join()
+        nt.assert_is_none(cache.cache.get(key))
+        nt.assert_not_equal(func(1), result)
+
+    def test_local_registry(self):
+        registry = LocalRegistry(threshold=8)
+
+        for key in range(12):
+            registry.add(['gen'], key)
+
+        # the oldest keys are forgotten once the threshold is exceeded
+        nt.assert_equal(registry.pop('gen'), set(range(6, 12)))
+        nt.assert_false(registry.expiries)
+
+        registry.add(['gen'], 'short', 0.01)
+        registry.add(['gen'], 'long')
+        time.sleep(0.02)
+
+        for key in range(7):
+            registry.add(['other'], key)
+
+        # expired keys go first, then the oldest live ones
+        nt.assert_equal(registry.pop('gen'), set())
+        nt.assert_equal(registry.pop('other'), set(range(1, 7)))
+        nt.assert_false(registry.generations)
+
+    def test_compact_keys(self):
+        config = dict(
+            self.cache.config, CACHE_KEY_REGISTRY=True,
+            CACHE_COMPACT_KEYS=True)
+
+        cache = Cache(**config)
+
+        @cache.memoize(tags=lambda a: ['a.{}'.format(a)])
+        def func(a):
+            return a + random.random()
+
+        key = func.make_cache_key(func.uncached, 1)
+        nt.assert_equal(len(key), 20)
+
+        result = func(1)
+        nt.assert_equal(cache.cache.get(key), result)
+        nt.assert_equal(func(1), result)
+
+        cache.invalidate_tags('a.1')
+        cache.reclaimer.join()
+        nt.assert_is_none(cache.cache.get(key))
+        nt.assert_not_equal(func(1), result)
+
+    def test_counter_versions(self):
+        config = dict(self.cache.config, CACHE_VERSIONING='counter')
+        cache = Cache(**config)
+
+        @cache.memoize(tags=lambda a: ['a.{}'.format(a)])
+        def func(a):
+            return a + random.random()
+
+        # concurrent first callers agree on the version
+        keys = []
+        target = lambda: keys.append(func.make_cache_key(func.uncached, 1))
+        threads = [Thread(target=target) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        nt.assert_equal(len(set(keys)), 1)
+
+        version_key = cache._memvname(function_namespace(func.uncached)[0])
+        version = cache.get(version_key)
+        result = func(1)
+        nt.assert_equal(func(1), result)
+
+        cache.delete_memoized(func)
+        nt.assert_equal(cache.get(version_key), version + 1)
+        nt.assert_not_equal(func(1), result)
+
+        result = func(1)
+        cache.invalidate_tags('a.1')
+        nt.assert_not_equal(func(1), result)
+
+        with nt.assert_raises(ValueError):
+            Cache(CACHE_VERSIONING='random')
+
+    def test_namespaced_counter_versions(self):
+        config = dict(
+            self.cache.config, CACHE_VERSIONING='counter',
+            CACHE_KEY_REGISTRY=True)
+
+        cache = Cache(namespace='ns', **config)
+
+        @cache.memoize()
+        def f(a):
+            return a + random.random()
+
+        @cache.memoize()
+        def g(a):
+            return a + random.random()
+
+        funcs = [f, g]
+
+        def get_version(func):
+            return func.make_cache_key(func.uncached, 1)[cache.key_hash_len:]
+
+        # functions don't share versions
+        versions = list(map(get_version, funcs))
+        nt.assert_not_equal(*versions)
+
+        results = [func(1) for func in funcs]
+
+        # resetting f never reclaims g's entries
+        cache.delete_memoized(funcs[0])
+        nt.assert_not_equal(get_version(funcs[0]), versions[1])
+        cache.reclaimer.join()
+        nt.assert_equal(funcs[1](1), results[1])
+
+        # a version key recreated after expiring doesn't revive old entries
+        version_key = cache._memvname(function_namespace(f.uncached)[0])
+        cache.delete(version_key)
+        nt.assert_not_equal(get_version(funcs[0]), versions[0])
+
+    def test_dedupe(self):
+        config = dict(self.cache.config, CACHE_DEDUPE_SIZE=1024)
+        cache = Cache(**config)
+        calls = []
+
+        @cache.memoize()
+        def report(a, size=2048):
+            calls.append(a)
+            return 'x' * size
+
+        keys = [report.make_cache_key(report.uncached, a) for a in range(2)]
+        nt.assert_equal(report(0), report(1))
+        nt.assert_equal(report(0), report(1))
+        nt.assert_equal(calls, [0, 1])
+
+        refs = [cache.cache.get(key) for key in keys]
+        nt.assert_is_instance(refs[0], ContentRef)
+        nt.assert_equal(refs[0].key, refs[1].key)
+
+        # small results are stored as is
+        nt.assert_equal(report(2, 10), 'x' * 10)
+        key = report.make_cache_key(report.uncached, 2, 10)
+        nt.assert_equal(cache.cache.get(key), 'x' * 10)
+
+        # the result is recomputed once its content is gone
+        cache.delete(refs[0].key)
+        nt.assert_equal(cache.parallel_map(report, [0], processes=False), [
+            'x' * 2048])
+
+        # which restores the content shared with the other result
+        nt.assert_is_instance(cache.cache.get(keys[0]), ContentRef)
+        nt.assert_equal(report(1), 'x' * 2048)
+        nt.assert_equal(calls, [0, 1, 2, 0])
+
+    def test_warm(self):
+        calls = []
+
+        @self.cache.memoize()
+        def func(a, b=1):
+            calls.append(a)
+            return a + b + random.random()
+
+        arguments = [(1,), (2, 3), {'a': 4}, [1, 1]]
+        nt.assert_equal(self.cache.warm(func, arguments), 3)
+        nt.assert_equal(len(calls), 3)
+
+        result = func(1)
+        nt.assert_equal(func(2, b=3), func(2, 3))
+        nt.assert_equal(func(4), func(a=4, b=1))
+        nt.assert_equal(len(calls), 3)
+
+        nt.assert_equal(self.cache.warm(func, [1, 5, 6], concurrency=2), 3)
+        nt.assert_not_equal(func(1), result)
+        nt.assert_equal(len(calls), 6)
+
+    def test_parallel_map(self):
+        calls = []
+
+        @self.cache.memoize()
+        def func(a, b=1):
+            calls.append(a)
+            return a + b + random.random()
+
+        result = func(1)
+        arguments = [1, (2, 3), {'a': 2, 'b': 3}, 4]
+        results = self.cache.parallel_map(func, arguments, processes=False)
+        nt.assert_equal(len(results), 4)
+        nt.assert_equal(results[0], result)
+        nt.assert_equal(results[1], results[2])
+        nt.assert_equal(calls, [1, 2, 4])
+        nt.assert_equal(func(4), results[3])
+
+        memoized = self.cache.memoize()(square)
+        squares = self.cache.parallel_map(memoized, [3, 4, 3], concurrency=2)
+        nt.assert_equal(squares, [9, 16, 9])
+
+    def test_warm_store(self):
+        config = dict(
+            self.cache.config, CACHE_KEY_REGISTRY=True, CACHE_STATS=True)
+
+        cache = Cache(**config)
+
+        @cache.memoize(is_negative=lambda result: result < 0)
+        def func(a):
+            return a
+
+        # the results are stored like memoize stores them
+        nt.assert_equal(cache.warm(func, [1, -1]), 2)
+        keys = [func.make_cache_key(func.uncached, a) for a in (1, -1)]
+        nt.assert_is_instance(cache.cache.get(keys[1]), Negative)
+        nt.assert_equal(func.cache_stats()['sets'], 2)
+
+        cache.delete_memoized(func)
+        cache.reclaimer.join()
+        nt.assert_equal(cache.cache.get_many(*keys), [None, None])
+
+        # entries that can't be unpickled are misses
+        key = func.make_cache_key(func.uncached, 1)
+        cache.set(key, Negative(exception=HTTPError(500, 'Error')))
+        results = cache.parallel_map(func, [1, 2], processes=False)
+        nt.assert_equal(results, [1, 2])
+        nt.assert_equal(cache.get(key), 1)
+
+    def test_dump_load(self):
+        for compress in (True, False):
+            self.cache.set('hi', 'hello')
+            self.cache.set('ȟį', {'a': [1, 2]})
+
+            fp = BytesIO()
+            nt.assert_equal(self.cache.dump(fp, compress=compress), 2)
+            self.cache.clear()
+            nt.assert_is_none(self.cache.get('hi'))
+
+            fp.seek(0)
+            nt.assert_equal(self.cache.load(fp), 2)
+            nt.assert_equal(self.cache.get('hi'), 'hello')
+            nt.assert_equal(self.cache.get('ȟį'), {'a': [1, 2]})
+            self.cache.clear()
+
+    def test_load_truncated(self):
+        self.cache.set('hi', 'hello')
+        fp = BytesIO()
+        self.cache.dump(fp, compress=False)
+
+        # the record is complete, but its value is cut short
+        truncated = BytesIO(fp.getvalue()[:-1])
+        nt.assert_raises(ValueError, self.cache.load, truncated)
+
 
 class TestNSCache(object):
     def setup(self):
@@ -442,10 +1060,653 @@ class TestNSCache(object):
         cache_key2 = cache._memoize_make_cache_key()(func)
         nt.assert_equal(cache_key1, cache_key2)
 
+    def test_delete_memoized(self):
+        @self.cache.memoize()
+        def func(a):
+            return a + random.random()
+
+        result = func(1)
+        nt.assert_equal(func(1), result)
+
+        self.cache.delete_memoized(func)
+        nt.assert_not_equal(func(1), result)
+
+
+class TestStats(object):
+    def setup(self):
+        self.events = []
+        listener = lambda *args: self.events.append(args)
+        self.cache = setup_func('simple', CACHE_STATS_LISTENERS=[listener])
+
+    def teardown(self):
+        self.cache.clear()
+
+    def test_memoize_stats(self):
+        @self.cache.memoize()
+        def func(a):
+            return a + random.random()
+
+        func(1)
+        func(1)
+        func(2)
+
+        stats = func.cache_stats()
+        nt.assert_equal(stats['hits'], 1)
+        nt.assert_equal(stats['misses'], 2)
+        nt.assert_equal(stats['sets'], 2)
+        nt.assert_equal(stats['errors'], 0)
+        nt.assert_equal(stats['latency']['get']['count'], 3)
+        nt.assert_equal(stats['latency']['compute']['count'], 2)
+        nt.assert_greater(stats['compute_seconds'], 0)
+
+        cache_stats = self.cache.stats.as_dict()
+        nt.assert_equal(cache_stats['hits'], 1)
+        nt.assert_equal(cache_stats['version_fetches'], 3)
+        nt.assert_equal(cache_stats['latency']['get_many']['count'], 3)
+
+        fname = function_namespace(func)[0]
+        nt.assert_in(('counter', 'hits', 1, fname), self.events)
+        nt.assert_in(('counter', 'version_fetches', 1, None), self.events)
+
+        text = self.cache.stats.prometheus()
+        nt.assert_in('mezmorize_hits_total 1', text)
+        nt.assert_in('mezmorize_hits_total{function="%s"} 1' % fname, text)
+
+    def test_profile(self):
+        @self.cache.memoize(profile=True)
+        def func(a):
+            return a + random.random()
+
+        nt.assert_equal(func(1), func(1))
+        profile = func.profile.as_dict()
+        phases = {'version', 'bind', 'hash', 'get', 'call', 'set'}
+        nt.assert_equal(profile['calls'], 2)
+        nt.assert_equal(profile['hits'], 1)
+        nt.assert_equal(set(profile['totals']), phases)
+        nt.assert_equal(func.cache_stats()['hits'], 1)
+
+        # profiled calls are still recorded in the stats
+        latency = func.cache_stats()['latency']
+        nt.assert_equal(latency['get']['count'], 2)
+        nt.assert_equal(latency['compute']['count'], 1)
+
+        fname = function_namespace(func)[0]
+        report = self.cache.profile_report(folded=True)
+        nt.assert_in('{};call '.format(fname), report)
+        nt.assert_in('per call (us)', self.cache.profile_report())
+
+        func.make_cache_key = lambda f, *args, **kwargs: 'key'
+        func.profile.reset()
+        func(2)
+        profile = func.profile.as_dict()
+        nt.assert_equal(set(profile['totals']), {'key', 'get', 'call', 'set'})
+
+    def test_profile_coalesce(self):
+        @self.cache.memoize(profile=True, coalesce=True)
+        def func(a):
+            time.sleep(0.1)
+            return a + random.random()
+
+        func.make_cache_key(func.uncached, 1)
+        threads = [Thread(target=func, args=(1,)) for _ in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # only one call computed the value, the others waited for it
+        profile = func.profile.as_dict()
+        nt.assert_equal(profile['calls'], 3)
+        nt.assert_equal(func.cache_stats()['latency']['compute']['count'], 1)
+        nt.assert_greater(profile['totals']['wait'], 0.1)
+
+    def test_disabled(self):
+        cache = setup_func('simple')
+
+        @cache.memoize()
+        def func(a):
+            return a + random.random()
+
+        nt.assert_equal(func(1), func(1))
+        nt.assert_is_none(cache.stats)
+        nt.assert_is_none(func.cache_stats())
+
+
+class TestLazyBackend(object):
+    def test_lazy(self):
+        cache = Cache(CACHE_TYPE='test_cache.client_cache')
+        nt.assert_is_none(cache._cache)
+
+        cache.set('key', 1)
+        backend = cache.cache
+        nt.assert_is_instance(backend, ClientCache)
+        nt.assert_is(cache.cache, backend)
+        nt.assert_equal(cache.get('key'), 1)
+
+        with nt.assert_raises(ImportError):
+            Cache(CACHE_TYPE='missing')
+
+    def test_fork(self):
+        if not hasattr(os, 'fork'):
+            return
+
+        caches = [Cache(CACHE_TYPE='test_cache.client_cache'), Cache()]
+        backends = [cache.cache for cache in caches]
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+
+        if not pid:
+            # only the backend with a client is recreated
+            recreated = [c.cache is not b for c, b in zip(caches, backends)]
+            os.write(write_fd, repr(recreated).encode('ascii'))
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+        os.close(write_fd)
+        nt.assert_equal(os.read(read_fd, 64), b'[True, False]')
+        os.close(read_fd)
+        nt.assert_is(caches[0].cache, backends[0])
+
+    def test_breaker(self):
+        breaker = {'window': 4, 'reset_timeout': 0.1}
+        cache = Cache(
+            CACHE_TYPE='test_cache.client_cache', CACHE_BREAKER=breaker)
+
+        @cache.memoize()
+        def double(x):
+            return x * 2
+
+        backend = cache.cache._cache
+        backend.down = True
+
+        # failures are misses, and the breaker opens after the window fills
+        nt.assert_equal(double(1), 2)
+        nt.assert_equal(double(2), 4)
+        nt.assert_equal(cache.breaker.state, 'open')
+
+        calls = backend.calls
+        nt.assert_equal(double(3), 6)
+        nt.assert_equal(backend.calls, calls)
+
+        # invalidations aren't silently lost
+        with nt.assert_raises(BackendUnavailable):
+            cache.delete_memoized(double, 3)
+
+        with nt.assert_raises(BackendUnavailable):
+            cache.delete_memoized(double)
+
+        # after the reset timeout, a successful probe closes it again
+        backend.down = False
+        time.sleep(0.1)
+        nt.assert_equal(double(4), 8)
+        nt.assert_equal(cache.breaker.state, 'closed')
+        nt.assert_equal(double(4), 8)
+        nt.assert_greater(backend.calls, calls)
+
+        # a probe that raises an unexpected error still ends
+        cache.breaker.opened = 0
+
+        with nt.assert_raises(ValueError):
+            cache.breaker.call(int, 'not a number')
+
+        nt.assert_equal(cache.breaker.state, 'closed')
+
+        # the local backends aren't guarded
+        cache = Cache(CACHE_BREAKER=True)
+        nt.assert_is_instance(cache.cache, SimpleCache)
+        nt.assert_is_none(cache.breaker)
+
+    def test_breaker_version_fetch(self):
+        cache = Cache(
+            CACHE_TYPE='test_cache.client_cache', CACHE_BREAKER=True)
+        computed = []
+
+        @cache.memoize()
+        def double(x):
+            computed.append(x)
+            return x * 2
+
+        def fail(*keys):
+            raise IOError('Connection reset')
+
+        nt.assert_equal(double(1), 2)
+        backend = cache.cache._cache
+        backend.get_many = fail
+
+        # a failed version fetch isn't mistaken for missing versions
+        nt.assert_equal(double(1), 2)
+        del backend.get_many
+        nt.assert_equal(double(1), 2)
+        nt.assert_equal(computed, [1, 1])
+
+        # a reset can't be based on a failed fetch
+        backend.get_many = fail
+
+        with nt.assert_raises(BackendUnavailable):
+            cache.delete_memoized(double)
+
+
+class TestReplicatedCache(object):
+    def setup(self):
+        self.cache = Cache(
+            CACHE_TYPE='replicated', CACHE_REPLICAS=2,
+            CACHE_REPLICA_TYPE='test_cache.client_cache',
+            CACHE_MEMCACHED_SERVERS=['a:1', 'b:1', 'c:1'])
+
+    def test_replicas(self):
+        backend = self.cache.cache
+        nt.assert_is_instance(backend, ReplicatedCache)
+        nt.assert_equal(len(backend.nodes), 3)
+
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.cache.add('d', 4)
+
+        for key in 'abcd':
+            positions = backend._locate(key)
+            nt.assert_equal(len(positions), 2)
+            nodes = backend.nodes
+            found = [pos for pos in range(len(nodes)) if nodes[pos].has(key)]
+            nt.assert_equal(found, sorted(positions))
+
+        # reads fail over to the next replica
+        backend.nodes[backend._locate('a')[0]].down = True
+        values = self.cache.get_many('a', 'b', 'c', 'd')
+        nt.assert_equal(values, [1, 2, 3, 4])
+
+        self.cache.delete('a')
+        nt.assert_is_none(self.cache.get('a'))
+
+    def test_copied_timeouts(self):
+        backend = self.cache.cache
+        self.cache.add('a', 1, timeout=1000)
+        nt.assert_equal(self.cache.inc('b', 2, timeout=2000), 2)
+        now = time.time()
+
+        # the copies on the other replica get the caller's timeout
+        for key, timeout in [('a', 1000), ('b', 2000)]:
+            for pos in backend._locate(key)[1:]:
+                expires = backend.nodes[pos]._cache[key][0]
+                nt.assert_almost_equal(expires, now + timeout, delta=5)
+
+    def test_hedge(self):
+        self.cache.config['CACHE_HEDGE_DELAY'] = 0.01
+        self.cache._set_cache()
+
+        @self.cache.memoize()
+        def double(x):
+            return x * 2
+
+        nt.assert_equal(double(1), 2)
+        backend = self.cache.cache
+
+        for node in backend.nodes:
+            node.delay = 0.5
+
+        # the hedged read to the second replica answers first
+        key = double.make_cache_key(double.uncached, 1)
+        backend.nodes[backend._locate(key)[1]].delay = 0
+        start = time.time()
+        nt.assert_equal(backend.get(key), 2)
+        nt.assert_less(time.time() - start, 0.25)
+
+
+class TestRequestScope(object):
+    def setup(self):
+        self.cache = Cache(CACHE_TYPE='test_cache.client_cache')
+        self.computed = []
+
+        @self.cache.memoize()
+        def double(x):
+            self.computed.append(x)
+            return x * 2
+
+        self.double = double
+
+    def test_request_scope(self):
+        double, backend = self.double, self.cache.cache
+        nt.assert_equal(double(1), 2)
+
+        with self.cache.request_scope() as scope:
+            calls = backend.calls
+            nt.assert_equal(double(1), 2)
+            fetched = backend.calls - calls
+            nt.assert_greater(fetched, 0)
+
+            # repeated calls skip the backend
+            nt.assert_equal([double(1), double(1)], [2, 2])
+            nt.assert_equal(backend.calls - calls, fetched)
+
+            with self.cache.request_scope() as nested:
+                nt.assert_is(nested, scope)
+
+            # writes and deletes are seen by the scope
+            self.cache.delete_memoized(double)
+            nt.assert_equal(double(1), 2)
+            nt.assert_equal(self.computed, [1, 1])
+
+            # other threads have their own scope
+            scopes = []
+            get_scope = self.cache.scope.get
+            thread = Thread(target=lambda: scopes.append(get_scope()))
+            thread.start()
+            thread.join()
+            nt.assert_equal(scopes, [None])
+
+        nt.assert_is_none(self.cache.scope.get())
+        calls = backend.calls
+        nt.assert_equal(double(1), 2)
+        nt.assert_greater(backend.calls, calls)
+
+
+class FlakyPubSub(object):
+    """A redis pubsub stand-in that sends a bad message and then loses its
+    connection the first time it is listened to"""
+    def __init__(self):
+        self.listens = 0
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        self.listens += 1
+
+        if self.listens == 1:
+            yield {'type': 'message', 'data': b'not json'}
+            raise IOError('Connection lost.')
+
+        message = {'origin': 'uid', 'keys': ['a']}
+        yield {'type': 'message', 'data': dumps(message)}
+
+    def close(self):
+        pass
+
+
+class FlakyRedis(object):
+    def pubsub(self, **kwargs):
+        return FlakyPubSub()
+
+
+def wait_for(received, timeout=3):
+    for _ in range(int(timeout * 100)):
+        if received:
+            break
+
+        time.sleep(0.01)
+
+
+class TestLocalTier(object):
+    def setup(self):
+        self.bus = LocalBus()
+        config = {
+            'CACHE_DIR': mkdtemp(), 'CACHE_LOCAL_TIMEOUT': 60,
+            'CACHE_BUS': self.bus}
+
+        self.cache1 = setup_func('filesystem', **config)
+        self.cache2 = setup_func('filesystem', **config)
+
+    def teardown(self):
+        self.cache1.clear()
+        self.bus.close()
+
+    def test_local_tier(self):
+        self.cache1.set('hi', 'hello')
+        nt.assert_equal(self.cache2.get('hi'), 'hello')
+        nt.assert_equal(self.cache2.local.get('hi'), 'hello')
+
+        self.cache1.set('hi', 'bye')
+        nt.assert_is_none(self.cache2.local.get('hi'))
+        nt.assert_equal(self.cache2.get('hi'), 'bye')
+
+        self.cache1.delete('hi')
+        nt.assert_is_none(self.cache2.get('hi'))
+
+        self.cache1.set_many({'a': 1, 'b': 2})
+        nt.assert_equal(self.cache2.get_many('a', 'b', 'c'), [1, 2, None])
+        self.cache1.clear()
+        nt.assert_equal(self.cache2.get_many('a', 'b'), [None, None])
+
+    def test_delete_memoized(self):
+        def func(a):
+            return a + random.random()
+
+        func1 = self.cache1.memoize()(func)
+        func2 = self.cache2.memoize()(func)
+        result = func1(1)
+        nt.assert_equal(func2(1), result)
+
+        self.cache1.delete_memoized(func1)
+        nt.assert_not_equal(func2(1), result)
+        nt.assert_equal(func1(1), func2(1))
+
+        result = func2(2)
+        self.cache2.delete_memoized(func2, 2)
+        nt.assert_not_equal(func1(2), result)
+
+    def test_unix_socket_bus(self):
+        received = []
+        bus = UnixSocketBus(mkdtemp())
+        bus.subscribe(received.append)
+
+        # bad messages are skipped
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.sendto(b'not json', bus.path)
+        sender.close()
+
+        bus.publish({'origin': 'uid', 'keys': ['a', 'b']})
+        wait_for(received)
+        bus.close()
+        nt.assert_equal(received, [{'origin': 'uid', 'keys': ['a', 'b']}])
+
+    def test_fork(self):
+        if not hasattr(os, 'register_at_fork'):
+            return
+
+        bus = UnixSocketBus(mkdtemp())
+        config = {
+            'CACHE_DIR': mkdtemp(), 'CACHE_LOCAL_TIMEOUT': 60,
+            'CACHE_BUS': bus}
+
+        cache = setup_func('filesystem', **config)
+        cache.set('hi', 'hello')
+        nt.assert_equal(cache.get('hi'), 'hello')
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+
+        if not pid:
+            # the child subscribes with its own socket, and receives the
+            # parent's invalidations
+            os.write(write_fd, bus.path.encode('utf-8'))
+
+            for _ in range(300):
+                if cache.local.get('hi') is None:
+                    break
+
+                time.sleep(0.01)
+
+            os.write(write_fd, repr(cache.local.get('hi')).encode('ascii'))
+            os._exit(0)
+
+        path = bus.path
+        child_path = os.read(read_fd, 1024).decode('utf-8')
+        cache.delete('hi')
+        os.waitpid(pid, 0)
+        os.close(write_fd)
+        nt.assert_equal(os.read(read_fd, 64), b'None')
+        os.close(read_fd)
+        nt.assert_not_equal(child_path, path)
+        bus.close()
+
+    def test_redis_bus_errors(self):
+        received = []
+        bus = RedisBus(FlakyRedis())
+        bus.subscribe(received.append)
+
+        # the listener survives the bad message and the lost connection
+        wait_for(received)
+        nt.assert_equal(received, [{'origin': 'uid', 'keys': ['a']}])
+        nt.assert_equal(bus.pubsub.listens, 2)
+        bus.close()
+
+
+if PY3:
+    from aio_helpers import get_fetch, gather, run
+
+    class TestAsync(object):
+        def setup(self):
+            self.cache = setup_func('simple')
+            self.calls = []
+
+        def teardown(self):
+            self.cache.clear()
+
+        def test_memoize(self):
+            fetch = get_fetch(self.cache, self.calls, cache_exceptions=KeyError)
+            results = run(gather(fetch, 'a', 'b', 'missing'))
+            nt.assert_is_instance(results[2], KeyError)
+            nt.assert_equal(run(gather(fetch, 'a', 'b')), results[:2])
+
+            results = run(gather(fetch, 'missing'))
+            nt.assert_is_instance(results[0], KeyError)
+            nt.assert_equal(sorted(self.calls), ['a', 'b', 'missing'])
+
+        def test_coalesce(self):
+            fetch = get_fetch(self.cache, self.calls, coalesce=True)
+            results = run(gather(fetch, 'a', 'a', 'a', 'missing', 'missing'))
+            nt.assert_equal(len(set(results[:3])), 1)
+            nt.assert_is_instance(results[3], KeyError)
+            nt.assert_is(results[3], results[4])
+            nt.assert_equal(self.calls, ['a', 'missing'])
+            nt.assert_equal(self.cache.tasks, {})
+
+        def test_coroutine_function(self):
+            fetch = get_fetch(self.cache, self.calls)
+            nt.assert_true(inspect.iscoroutinefunction(fetch))
+
+            # nothing is scheduled until the coroutine is awaited
+            fetch('a').close()
+            nt.assert_equal(self.calls, [])
+
+            result = run(fetch('a'))
+            nt.assert_equal(run(fetch('a')), result)
+            nt.assert_equal(self.calls, ['a'])
+
+if PY3:
+    from aio_helpers import get_scale
+
+    class TestKeywordOnly(object):
+        def setup(self):
+            self.cache = setup_func('simple')
+            self.calls = []
+
+        def teardown(self):
+            self.cache.clear()
+
+        def test_kwonly_args(self):
+            scale = get_scale(self.cache, self.calls)
+            nt.assert_equal(scale(1), scale(1, factor=2))
+            nt.assert_not_equal(scale(1), scale(1, factor=3))
+
+        def test_ignore_key_args(self):
+            key_args = {'factor': abs}
+            scale = get_scale(
+                self.cache, self.calls, ignore=('conn',), key_args=key_args)
+
+            result = scale(1, factor=-2, conn='conn1')
+            nt.assert_equal(scale(1, factor=2, conn='conn2'), result)
+            nt.assert_not_equal(scale(1, factor=3, conn='conn3'), result)
+            nt.assert_equal(self.calls, ['conn1', 'conn3'])
+
+
+class TestEviction(object):
+    def test_lru(self):
+        cache = LRUCache(threshold=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        nt.assert_equal(cache.get('a'), 1)
+
+        cache.set('c', 3)
+        nt.assert_is_none(cache.get('b'))
+        nt.assert_equal(cache.get('a'), 1)
+        nt.assert_equal(cache.get('c'), 3)
+
+        nt.assert_true(cache.clear())
+        nt.assert_is_none(cache.get('a'))
+
+    def test_gdsf(self):
+        cache = GDSFCache(threshold=2)
+        cache.set('cheap', 1, cost=0.001)
+        cache.set('costly', 2, cost=1)
+        cache.set('new', 3, cost=0.01)
+        nt.assert_is_none(cache.get('cheap'))
+        nt.assert_equal(cache.get('costly'), 2)
+        nt.assert_greater(cache.clock, 0)
+
+        # frequently used items outlive more costly ones
+        for _ in range(200):
+            cache.get('new')
+
+        cache.set('newer', 4, cost=0.5)
+        nt.assert_is_none(cache.get('costly'))
+        nt.assert_equal(cache.get('new'), 3)
+
+        nt.assert_true(cache.clear())
+        nt.assert_is_none(cache.get('new'))
+        nt.assert_equal(cache.clock, 0)
+        nt.assert_equal((cache._meta, cache._heap), ({}, []))
+        nt.assert_not_in('clear', vars(cache))
+
+    def test_threads(self):
+        errors = []
+
+        def hammer(cache, offset):
+            try:
+                for i in range(2000):
+                    key = str((i + offset) % 30)
+                    cache.set(key, i)
+                    cache.get(str(i % 30))
+                    cache.delete(str((i * 7) % 30))
+            except Exception as exc:
+                errors.append(exc)
+
+        for cache in (LRUCache(threshold=10), GDSFCache(threshold=10)):
+            threads = [
+                Thread(target=hammer, args=(cache, offset))
+                for offset in range(8)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            nt.assert_equal(errors, [])
+            nt.assert_less_equal(len(cache._cache), 10)
+
+        # the eviction bookkeeping matches the items
+        nt.assert_equal(set(cache._meta), set(cache._cache))
+
+    def test_memoize(self):
+        cache = setup_func('simple', CACHE_EVICTION='gdsf', CACHE_THRESHOLD=5)
+        nt.assert_is_instance(cache.cache, GDSFCache)
+
+        @cache.memoize()
+        def func(a):
+            time.sleep(0.05 if a == 'slow' else 0)
+            return a + str(random.random())
+
+        slow = func('slow')
+
+        for i in range(20):
+            func(str(i))
+
+        nt.assert_equal(func('slow'), slow)
+
 
 class TestFileSystemCache(TestCache):
     def setup(self):
-        self.cache = setup_func('filesystem', CACHE_DIR='/tmp')
+        self.cache = setup_func('filesystem', CACHE_DIR=mkdtemp())
 
     def teardown(self):
         self.cache.clear()
@@ -461,6 +1722,61 @@ class TestFileSystemCache(TestCache):
         self.cache.add(b'hi', b'foobar')
         nt.assert_equal(self.cache.get(b'hi'), 'hello')
 
+    def test_load_count(self):
+        self.cache.set('hi', 'hello')
+        self.cache.set('bye', 'goodbye')
+        fp = BytesIO()
+        self.cache.dump(fp)
+        self.cache.clear()
+
+        # loaded items count towards the threshold, like set ones
+        fp.seek(0)
+        nt.assert_equal(self.cache.load(fp), 2)
+        nt.assert_equal(self.cache.cache._file_count, 2)
+
+
+class TestStripedCache(TestCache):
+    def setup(self):
+        self.cache = setup_func('striped', CACHE_SHARDS=4)
+
+    def teardown(self):
+        self.cache.clear()
+
+    def test_dict_config(self):
+        check_cache_type(self.cache, 'striped')
+        check_cache_instance(self.cache, StripedCache)
+        nt.assert_equal(len(self.cache.cache.shards), 4)
+
+    def test_threads(self):
+        errors = []
+        cache = StripedCache(threshold=64, shards=4)
+        caches = (cache, SimpleCache(threshold=64))
+
+        def work(cache, seed):
+            rand = random.Random(seed)
+
+            try:
+                for _ in range(2000):
+                    key = rand.randint(0, 200)
+                    cache.set(key, key)
+                    cache.get(rand.randint(0, 200))
+                    cache.inc('counter')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            Thread(target=work, args=(c, seed))
+            for c in caches for seed in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        nt.assert_equal(errors, [])
+        nt.assert_equal(cache.get('counter'), 16000)
+
 
 if HAS_MEMCACHE:
     class TestMemcachedCache(TestCache):
@@ -484,6 +1800,15 @@ if HAS_MEMCACHE:
                 yield check_too_big, self.cache, BIGINT
                 self.teardown()
 
+        def test_get_values(self):
+            long_key = 'k' * 300
+            self.cache.set_many({'a': 1, 'b': 2})
+            keys = ('a', 'b', 'c', long_key)
+            trusted = self.cache.get_values(*keys, trusted=True)
+            nt.assert_equal(trusted, [1, 2, None, None])
+            untrusted = self.cache.get_values('a b', *keys)
+            nt.assert_equal(untrusted, [None, 1, 2, None, None])
+
 else:
     print('TestMemcachedCache requires Memcache')
 
@@ -569,5 +1894,33 @@ if HAS_REDIS:
 else:
     print('TestRedisCache requires Redis')
 
+if HAS_REDIS:
+    class TestRedisRegistry(object):
+        def setup(self):
+            self.cache = setup_func('redis', CACHE_KEY_REGISTRY=True)
+
+        def teardown(self):
+            self.cache.clear()
+
+        def test_dump_registry(self):
+            cache = self.cache
+
+            @cache.memoize(tags=lambda a: ['a.{}'.format(a)])
+            def func(a):
+                return a + random.random()
+
+            result = func(1)
+            nt.assert_is_instance(cache.registry, RedisRegistry)
+
+            # the registry's sets aren't part of the snapshot
+            fp = BytesIO()
+            count = cache.dump(fp)
+            cache.clear()
+            fp.seek(0)
+            nt.assert_equal(cache.load(fp), count)
+            nt.assert_equal(func(1), result)
+else:
+    print('TestRedisRegistry requires Redis')
+
 if __name__ == '__main__':
     nt.main()